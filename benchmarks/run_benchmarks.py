@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+# =============================================================================
+#                          ROS SWITCH BENCHMARKS
+# Build a synthetic set of profiles and workspaces, then time the profile
+# lookup, the YAML parsing, the scripts generation and full load / unload /
+# switch cycles in the available shells. The results are written as JSON so
+# that they can be compared across releases.
+# =============================================================================
+
+from argparse import ArgumentParser
+from typing import Callable, Dict, List
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+BIN_DIR = os.path.join(REPO_DIR, "bin")
+SHELLS = ["bash", "zsh"]
+
+
+# =============================================================================
+# Synthetic tree
+# =============================================================================
+def make_workspace(root: str, idx: int) -> str:
+    """
+    Create a fake workspace, whose setup file exports a few variables like a
+    colcon install space does
+    """
+    ws = os.path.join(root, "workspaces", f"ws_{idx}")
+    install = os.path.join(ws, "install")
+    os.makedirs(os.path.join(install, f"pkg_{idx}", "bin"), exist_ok=True)
+    with open(os.path.join(install, "local_setup.sh"), "w") as f:
+        f.write(
+            f"""export AMENT_PREFIX_PATH="{install}/pkg_{idx}${{AMENT_PREFIX_PATH:+:$AMENT_PREFIX_PATH}}"
+export CMAKE_PREFIX_PATH="{install}/pkg_{idx}${{CMAKE_PREFIX_PATH:+:$CMAKE_PREFIX_PATH}}"
+export PATH="{install}/pkg_{idx}/bin:$PATH"
+export COLCON_PREFIX_PATH="{install}${{COLCON_PREFIX_PATH:+:$COLCON_PREFIX_PATH}}"
+"""
+        )
+    return ws
+
+
+def make_profile(directory: str, idx: int, workspaces: List[str], n_paths: int) -> None:
+    paths = "\n".join(f"            - /opt/bench/{idx}/lib/{i}" for i in range(n_paths))
+    wks = "\n".join(f'        - "{ws}"' for ws in workspaces)
+    with open(os.path.join(directory, f"bench_{idx}.rosprofile"), "w") as f:
+        f.write(f"""preset:
+    metadata:
+        author: Benchmark
+        date: "01/2024"
+        description: "Synthetic profile {idx}"
+    ros_version: 2
+    env_var:
+        BENCH_PROFILE: {idx}
+    ros:
+        domain_id: {idx % 100}
+        localhost: true
+    workspaces:
+{wks if len(workspaces) != 0 else "        []"}
+    paths:
+        library:
+{paths}
+        path:
+{paths}
+""")
+
+
+def make_tree(root: str, n_profiles: int, n_workspaces: int, n_paths: int) -> None:
+    """
+    Create the synthetic tree: half of the profiles in an admin path, half in
+    a user path, each profile sourcing up to 3 of the workspaces.
+    """
+    workspaces = [make_workspace(root, i) for i in range(n_workspaces)]
+    for kind in ("admin", "user"):
+        os.makedirs(os.path.join(root, kind, "profiles"), exist_ok=True)
+    for i in range(n_profiles):
+        kind = "admin" if i % 2 == 0 else "user"
+        wks = [workspaces[(i + k) % n_workspaces] for k in range(min(3, n_workspaces))]
+        make_profile(os.path.join(root, kind, "profiles"), i, wks, n_paths)
+
+
+def setup_environment(root: str) -> None:
+    """
+    Isolate the benchmark from the configuration of the user. Must be done
+    before importing ros_switch, as its paths are computed at import.
+    """
+    home = os.path.join(root, "home")
+    os.makedirs(home, exist_ok=True)
+    os.environ.update(
+        {
+            "HOME": home,
+            "XDG_CACHE_HOME": os.path.join(root, "cache"),
+            "XDG_RUNTIME_DIR": os.path.join(root, "run"),
+            "RSWCH_CUSTOM_ADMIN_PATHS": os.path.join(root, "admin"),
+            "RSWCH_CUSTOM_PATHS": os.path.join(root, "user"),
+        }
+    )
+    for var in ("RSWCH_PRESET_NAME", "RSWCH_SHELL_PID"):
+        os.environ.pop(var, None)
+
+
+# =============================================================================
+# Timing helpers
+# =============================================================================
+def summarize(samples: List[float]) -> Dict[str, float | int]:
+    """
+    Statistics of a list of durations (in seconds), reported in milliseconds
+    """
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "min_ms": round(min(ms), 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "mean_ms": round(statistics.mean(ms), 4),
+        "max_ms": round(max(ms), 4),
+    }
+
+
+def timeit(
+    func: Callable[[], object],
+    repeat: int,
+    setup: Callable[[], object] | None = None,
+) -> Dict[str, float | int]:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+def bench_python(root: str, n_profiles: int, repeat: int) -> Dict[str, dict]:
+    sys.path.insert(0, BIN_DIR)
+    from ros_switch.common import PresetData, Shell
+    from ros_switch.common.PresetIndex import PresetIndex
+    from ros_switch.common.ScriptMeta import ScriptMeta
+    from ros_switch.common.constants import CACHE_DIR, CONFIGS_CACHE_DIR, INDEX_FILE
+    from ros_switch.common.generator.ScriptGenerator import ScriptGenerator
+
+    results = {}
+    middle = f"bench_{n_profiles // 2}"
+    last = f"bench_{n_profiles - 1}"
+
+    def drop_index():
+        PresetIndex._INSTANCE = None
+        index_file = os.path.join(CACHE_DIR, INDEX_FILE)
+        if os.path.exists(index_file):
+            os.unlink(index_file)
+
+    def reload_index():
+        PresetIndex._INSTANCE = None
+
+    # Profile lookup
+    results["find_profile.cold"] = timeit(
+        lambda: PresetData.find_profile(last), repeat, drop_index
+    )
+    results["find_profile.disk_index"] = timeit(
+        lambda: PresetData.find_profile(last), repeat, reload_index
+    )
+    results["find_profile.warm"] = timeit(
+        lambda: PresetData.find_profile(middle), repeat
+    )
+    results["list_preset_files"] = timeit(PresetData.list_preset_files, repeat)
+
+    # YAML parsing
+    preset = PresetData.find_profile(middle)
+    assert preset is not None
+
+    def fresh_preset():
+        preset.config = None
+        PresetData._LOADED_CONFIGS.clear()
+        PresetData._RESOLVED_TREES.clear()
+        shutil.rmtree(os.path.join(CACHE_DIR, CONFIGS_CACHE_DIR), ignore_errors=True)
+        Shell.flush()
+
+    def forget_preset():
+        preset.config = None
+        PresetData._LOADED_CONFIGS.clear()
+        PresetData._RESOLVED_TREES.clear()
+
+    results["get_config.cold"] = timeit(preset.get_config, repeat, fresh_preset)
+    preset.get_config()
+    results["get_config.disk_cache"] = timeit(preset.get_config, repeat, forget_preset)
+    results["get_config.cached"] = timeit(
+        preset.get_config, repeat, lambda: setattr(preset, "config", None)
+    )
+
+    # Scripts generation
+    config = preset.get_config()
+    out_dir = os.path.join(root, "generated")
+    os.makedirs(out_dir, exist_ok=True)
+
+    def generate():
+        ScriptGenerator(
+            config,  # type: ignore
+            preset.preset_name,
+            os.path.join(out_dir, "load.sh"),
+            os.path.join(out_dir, "unload.sh"),
+            ScriptMeta.from_sources([preset.preset_file]),
+        ).generate_load_unload()
+        Shell.flush()
+
+    results["generate_load_unload"] = timeit(generate, repeat)
+
+    def generate_frozen():
+        meta = ScriptMeta.from_sources([preset.preset_file])
+        meta.options["freeze"] = True
+        ScriptGenerator(
+            config,  # type: ignore
+            preset.preset_name,
+            os.path.join(out_dir, "load.sh"),
+            os.path.join(out_dir, "unload.sh"),
+            meta,
+        ).generate_load_unload()
+        Shell.flush()
+
+    if len(config.workspaces) != 0 and shutil.which("bash") is not None:  # type: ignore
+        results["generate_load_unload.frozen"] = timeit(generate_frozen, repeat)
+
+    # Generation of every synthetic profile, as `rosswitch gen all` does
+    def generate_all():
+        for p in PresetData.list_preset_files().values():
+            if p.preset_file.startswith(root):
+                p.generate_files(ignore_warnings=True, force=True)
+        Shell.flush()
+
+    results["generate_all"] = timeit(generate_all, max(1, repeat // 10))
+    return results
+
+
+# Shell driver timing full cycles with the shell clock, so that the shell
+# startup isn't part of the measures
+SHELL_DRIVER = r"""
+[[ -n "$ZSH_VERSION" ]] && zmodload zsh/datetime
+wrapper="$1"; first="$2"; second="$3"; repeat="$4"
+i=0
+while (( i < repeat )); do
+    t0=$EPOCHREALTIME
+    source "$wrapper" "$first" > /dev/null 2>&1
+    t1=$EPOCHREALTIME
+    source "$wrapper" "$second" > /dev/null 2>&1
+    t2=$EPOCHREALTIME
+    source "$wrapper" unload > /dev/null 2>&1
+    t3=$EPOCHREALTIME
+    echo "$t0 $t1 $t2 $t3"
+    i=$(( i + 1 ))
+done
+"""
+
+
+def bench_shell(shell: str, n_profiles: int, repeat: int) -> Dict[str, dict]:
+    """
+    Time load / switch / unload cycles in the given shell
+    """
+    wrapper = os.path.join(BIN_DIR, ".rosswitch")
+    first, second = "bench_0", f"bench_{n_profiles - 1}"
+
+    # Make sure both profiles are generated, so that only switching is timed
+    subprocess.run(
+        [sys.executable, ".rosswitch_py.py", "gen", first],
+        cwd=BIN_DIR,
+        capture_output=True,
+    )
+    subprocess.run(
+        [sys.executable, ".rosswitch_py.py", "gen", second],
+        cwd=BIN_DIR,
+        capture_output=True,
+    )
+
+    proc = subprocess.run(
+        [shell, "-c", SHELL_DRIVER, shell, wrapper, first, second, str(repeat)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{shell} benchmark failed:\n{proc.stderr}")
+
+    loads, switches, unloads = [], [], []
+    for line in proc.stdout.splitlines():
+        t = [float(v.replace(",", ".")) for v in line.split()]
+        if len(t) != 4:
+            continue
+        loads.append(t[1] - t[0])
+        switches.append(t[2] - t[1])
+        unloads.append(t[3] - t[2])
+    if len(loads) == 0:
+        raise RuntimeError(f"{shell} benchmark produced no measure")
+    return {
+        f"{shell}.load": summarize(loads),
+        f"{shell}.switch": summarize(switches),
+        f"{shell}.unload": summarize(unloads),
+    }
+
+
+# =============================================================================
+# Main
+# =============================================================================
+def main() -> None:
+    parser = ArgumentParser(description="ros_switch benchmarks")
+    parser.add_argument("-p", "--profiles", type=int, default=200)
+    parser.add_argument("-w", "--workspaces", type=int, default=10)
+    parser.add_argument("-l", "--paths", type=int, default=50)
+    parser.add_argument("-r", "--repeat", type=int, default=20)
+    parser.add_argument(
+        "-o", "--output", default=None, help="JSON output file (default: stdout)"
+    )
+    parser.add_argument(
+        "--no-shell", action="store_true", help="skip the shell cycles benchmarks"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the synthetic tree on exit"
+    )
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="ros_switch_bench_")
+    try:
+        make_tree(root, args.profiles, args.workspaces, args.paths)
+        setup_environment(root)
+
+        results = bench_python(root, args.profiles, args.repeat)
+        shells = [] if args.no_shell else [s for s in SHELLS if shutil.which(s)]
+        for shell in shells:
+            results.update(bench_shell(shell, args.profiles, args.repeat))
+
+        from ros_switch.common.constants import VERSION
+
+        report = {
+            "version": VERSION,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "profiles": args.profiles,
+                "workspaces": args.workspaces,
+                "paths": args.paths,
+                "repeat": args.repeat,
+                "shells": shells,
+            },
+            "results": results,
+        }
+    finally:
+        if args.keep:
+            print(f"Synthetic tree kept in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    out = json.dumps(report, indent=2)
+    if args.output is None:
+        print(out)
+    else:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+
+
+if __name__ == "__main__":
+    main()
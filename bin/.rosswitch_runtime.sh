@@ -0,0 +1,235 @@
+#!/bin/sh
+
+# =============================================================================
+# ROS Switch runtime library: the shell functions called by the generated
+# loading / unloading scripts.
+#
+# It is sourced once per shell session (by setup.sh, or by the first generated
+# script run in a shell without it), sourcing it again being a no-op. When a
+# function changes, bump _RSWCH_RUNTIME so that the running shells source the
+# new version. When the generated scripts need a new function, also bump
+# RUNTIME_LIB_VERSION in ros_switch/common/constants.py.
+# =============================================================================
+if [[ "${_RSWCH_RUNTIME:-0}" -ge 4 ]]; then
+  return 0
+fi
+
+# -----------------------------------------------------------------------------
+# Workspaces
+# -----------------------------------------------------------------------------
+
+# Source the setup file of a workspace, looked for in its install, devel or
+# root directory (the generated scripts only call it when the workspace layout
+# changed since their generation)
+function _rswch_source_ws() {
+    local _rswch_sub
+    for _rswch_sub in "/install/" "/install_isolated/" "/devel/" "/devel_isolated/" "/"; do
+        if [[ -f "$1${_rswch_sub}local_setup.sh" ]]; then
+            source "$1${_rswch_sub}local_setup.sh"
+            return
+        fi
+    done
+    printf '\033[33mWorkspace %s does not seems to be a ROS workspace. No local_setup.sh found!\033[39m\n' "$1"
+}
+
+# -----------------------------------------------------------------------------
+# Paths
+# -----------------------------------------------------------------------------
+
+# The path functions take the name of the variable to change, read and written
+# with builtins only (no sub-shell), and leave no empty entry in it.
+
+# Append entries to a path variable, skipping the ones already in it
+# Usage: _rswch_path_add VAR entry...
+function _rswch_path_add() {
+    local _rswch_var="$1" _rswch_val _rswch_entry
+    eval "_rswch_val=\"\${$1-}\""
+    shift
+    for _rswch_entry in "$@"; do
+        if [[ -n "$_rswch_entry" && ":$_rswch_val:" != *":$_rswch_entry:"* ]]; then
+            _rswch_val="${_rswch_val:+$_rswch_val:}$_rswch_entry"
+        fi
+    done
+    export "$_rswch_var=$_rswch_val"
+}
+
+# Remove from a path variable the given directories and their sub-directories
+# (e.g. the entries of a workspace)
+# Usage: _rswch_path_remove VAR directory...
+function _rswch_path_remove() {
+    eval "[[ -n \"\${$1+x}\" ]]" || return 0
+    local _rswch_var="$1" _rswch_rest _rswch_val="" _rswch_entry _rswch_dir _rswch_keep
+    eval "_rswch_rest=\"\${$1}:\""
+    shift
+    while [[ -n "$_rswch_rest" ]]; do
+        _rswch_entry="${_rswch_rest%%:*}"
+        _rswch_rest="${_rswch_rest#*:}"
+        _rswch_keep=1
+        for _rswch_dir in "$@"; do
+            if [[ -n "$_rswch_dir" && ( "$_rswch_entry" == "$_rswch_dir" || "$_rswch_entry" == "${_rswch_dir%/}/"* ) ]]; then
+                _rswch_keep=0
+                break
+            fi
+        done
+        if [[ $_rswch_keep -eq 1 && -n "$_rswch_entry" ]]; then
+            _rswch_val="${_rswch_val:+$_rswch_val:}$_rswch_entry"
+        fi
+    done
+    export "$_rswch_var=$_rswch_val"
+}
+
+# Remove the duplicated entries of path variables, keeping the first one (the
+# one the lookups find)
+# Usage: _rswch_path_dedup VAR...
+function _rswch_path_dedup() {
+    local _rswch_var _rswch_rest _rswch_val _rswch_entry
+    for _rswch_var in "$@"; do
+        eval "[[ -n \"\${$_rswch_var+x}\" ]]" || continue
+        eval "_rswch_rest=\"\${$_rswch_var}:\""
+        _rswch_val=""
+        while [[ -n "$_rswch_rest" ]]; do
+            _rswch_entry="${_rswch_rest%%:*}"
+            _rswch_rest="${_rswch_rest#*:}"
+            if [[ -n "$_rswch_entry" && ":$_rswch_val:" != *":$_rswch_entry:"* ]]; then
+                _rswch_val="${_rswch_val:+$_rswch_val:}$_rswch_entry"
+            fi
+        done
+        export "$_rswch_var=$_rswch_val"
+    done
+}
+
+# Function that remove ROS workspaces from a path (eg PATH, PYTHONPATH, ...),
+# kept for the scripts generated by the previous versions
+# Made by O. Kermorgan (https://github.com/oKermorgan/) for the ros_management_tools project
+function _rswch_remove_paths()
+{
+    if [[ $SHELL_TYPE == "bash" ]]; then
+        IFS=':' read -ra PATHES <<< "$1"
+    else
+        IFS=':' read -rA PATHES <<< "$1"
+    fi
+    local THISPATH=""
+    local pattern
+    for fpath in "${PATHES[@]}"; do
+        local to_remove=0
+        for pattern in "${@:2}"; do
+            if [[ $fpath = *"${pattern}"* ]]; then
+                to_remove=1
+                break
+            fi
+        done
+        if [ $to_remove -eq 0 ]; then
+            THISPATH="$THISPATH:$fpath"
+        fi
+    done
+    echo $THISPATH | cut -c2-
+}
+
+# -----------------------------------------------------------------------------
+# Network
+# -----------------------------------------------------------------------------
+
+# Function that resolves the IPv4 address of the first interface whose name
+# matches the given expression (default to localhost) into _rswch_ip.
+# The address is usually resolved by rosswitch before loading, this is the
+# fallback, reading the Linux /proc/net tables with shell builtins only.
+function _rswch_interface_ip() {
+    local to_find="${1:-lo}"
+    _rswch_ip=""
+
+    # Networks of the matching interfaces, as "network mask" (host byte order)
+    local nets=()
+    local iface dest gw flags refcnt use metric mask rest
+    if [[ -r /proc/net/route ]]; then
+        while read -r iface dest gw flags refcnt use metric mask rest; do
+            if [[ "$iface" != "Iface" && "$mask" != "00000000" && "$iface" =~ $to_find ]]; then
+                nets+=("$(( 16#$dest )) $(( 16#$mask ))")
+            fi
+        done < /proc/net/route
+    fi
+
+    # Local addresses, looked for in the matching networks
+    local line last="" o1 o2 o3 o4 r val net
+    if [[ ${#nets[@]} -ne 0 && -r /proc/net/fib_trie ]]; then
+        while read -r line; do
+            if [[ "$line" == "|-- "* ]]; then
+                last="${line#|-- }"
+            elif [[ "$line" == "/32 host LOCAL" && -n "$last" ]]; then
+                o1="${last%%.*}"; r="${last#*.}"
+                o2="${r%%.*}"; r="${r#*.}"
+                o3="${r%%.*}"; o4="${r#*.}"
+                val=$(( (o4 << 24) | (o3 << 16) | (o2 << 8) | o1 ))
+                for net in "${nets[@]}"; do
+                    if (( (val & ${net#* }) == ${net%% *} )); then
+                        _rswch_ip="$last"
+                        return
+                    fi
+                done
+            fi
+        done < /proc/net/fib_trie
+    fi
+
+    if [[ "lo" =~ $to_find ]]; then
+        _rswch_ip="127.0.0.1"
+    fi
+}
+
+# -----------------------------------------------------------------------------
+# Timed sections
+# -----------------------------------------------------------------------------
+
+# The durations (in microseconds) are recorded in _rswch_timings as
+# "duration|kind|label", and ranked at the end of the script
+if [[ -n "$ZSH_VERSION" ]]; then
+    zmodload zsh/datetime 2> /dev/null
+fi
+function _rswch_clock() {
+    if [[ -n "$ZSH_VERSION" ]]; then
+        _rswch_us=$(( epochtime[1] * 1000000 + epochtime[2] / 1000 ))
+    elif [[ -n "$EPOCHREALTIME" ]]; then
+        _rswch_us=$(( ${EPOCHREALTIME%[.,]*} * 1000000 + 10#${EPOCHREALTIME#*[.,]} ))
+    else
+        _rswch_us=$(( SECONDS * 1000000 ))
+    fi
+}
+function _rswch_timings_begin() {
+    _rswch_timings=()
+    _rswch_section=""
+    _rswch_clock
+    _rswch_t0=$_rswch_us
+}
+function _rswch_section_end() {
+    if [[ -n "$_rswch_section" ]]; then
+        _rswch_clock
+        _rswch_timings+=("$(( _rswch_us - _rswch_section_t0 ))|section|$_rswch_section")
+        _rswch_section=""
+    fi
+}
+function _rswch_section_start() {
+    _rswch_section_end
+    _rswch_section="$1"
+    _rswch_clock
+    _rswch_section_t0=$_rswch_us
+}
+function _rswch_step_start() {
+    _rswch_clock
+    _rswch_step_t0=$_rswch_us
+}
+function _rswch_step_end() {
+    _rswch_clock
+    _rswch_timings+=("$(( _rswch_us - _rswch_step_t0 ))|$1|$2")
+}
+function _rswch_timings_report() {
+    _rswch_section_end
+    _rswch_clock
+    local total=$(( _rswch_us - _rswch_t0 ))
+    (( total > 0 )) || total=1
+    printf '%s (total %d.%03d ms):\n' "$1" $(( total / 1000 )) $(( total % 1000 ))
+    local us kind label
+    printf '%s\n' "${_rswch_timings[@]}" | sort -t '|' -k 1,1 -rn | while IFS='|' read -r us kind label; do
+        printf '\t%6d.%03d ms %3d%%  %-8s %s\n' $(( us / 1000 )) $(( us % 1000 )) $(( us * 100 / total )) "$kind" "$label"
+    done
+    unset _rswch_timings _rswch_section _rswch_section_t0 _rswch_step_t0 _rswch_t0 _rswch_us
+}
+
+_RSWCH_RUNTIME=4
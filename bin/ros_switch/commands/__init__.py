@@ -1,6 +1,22 @@
-from .cmd_list import Commands
-from .load import load
-from .unload import unload
-from .list import list_configs, ListArgs
-from .gen import generate_files, GenArgs
-from .tools import tools_section, ToolsChoices
+from importlib import import_module
+
+# The commands are imported on first access, so that running one command does
+# not import the dependencies of all the others
+_EXPORTS = {
+    "Commands": ".cmd_list",
+    "load": ".load",
+    "unload": ".unload",
+    "list_configs": ".list",
+    "generate_files": ".gen",
+    "GenArgs": ".gen",
+    "tools_section": ".tools",
+    "ToolsChoices": ".tools",
+    "daemon_section": ".daemon",
+    "DaemonChoices": ".daemon",
+}
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
@@ -9,6 +9,8 @@ class Commands(Enum):
     NEW = "new"
     EXTEND = "extend"
     TOOLS = "tools"
+    DAEMON = "daemon"
+    WATCH = "watch"
 
     @staticmethod
     def is_value(txt: str) -> bool:
@@ -0,0 +1,306 @@
+from enum import Enum
+from typing import Dict, List, Tuple
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from .cmd_list import Commands
+from ..common.ShellCom import Shell
+from ..utils.timing import CPROFILE_FLAG, Timings
+from ..common.constants import (
+    DAEMON_PID_FILE,
+    DAEMON_SOCKET,
+    ENV_CALLER_DIR,
+    ENV_CUSTOM_ADMIN_PATH,
+    ENV_CUSTOM_PATH,
+    ENV_PRESET_NAME,
+    ENV_SHELL_PID,
+    ENV_TRACE,
+    ENV_TRACE_PROFILE,
+    INSTALL_DIR,
+    PRESET_PATHS,
+    RUNTIME_DIR,
+    runtime_dir_ok,
+    setup_paths,
+)
+
+# Environment of the calling shell forwarded with each request
+FORWARDED_ENV = [
+    ENV_PRESET_NAME,
+    ENV_SHELL_PID,
+    ENV_CALLER_DIR,
+    "SHELL_TYPE",
+    ENV_CUSTOM_ADMIN_PATH,
+    ENV_CUSTOM_PATH,
+    ENV_TRACE,
+    ENV_TRACE_PROFILE,
+]
+ENV_SEPARATOR = "--"
+# Commands never run by the daemon (the long running ones)
+LOCAL_COMMANDS = [Commands.DAEMON.value, Commands.WATCH.value]
+REQUEST_TIMEOUT = 5
+START_TIMEOUT = 3
+
+
+class DaemonChoices(Enum):
+    START = "start"
+    STOP = "stop"
+    STATUS = "status"
+    RUN = "run"
+
+    @staticmethod
+    def get_vals() -> List[str]:
+        return [v.value for _, v in DaemonChoices.__members__.items()]
+
+
+def daemon_section(daemon_action: str) -> None:
+    match DaemonChoices(daemon_action):
+        case DaemonChoices.START:
+            _start()
+        case DaemonChoices.STOP:
+            _stop()
+        case DaemonChoices.STATUS:
+            pid = _daemon_pid()
+            if pid is None:
+                Shell.txt("The rosswitch daemon is not running")
+            else:
+                Shell.txt(f"The rosswitch daemon is running (pid {pid})")
+                Shell.txt(f"\t-> listening on {_socket_path()}")
+        case DaemonChoices.RUN:
+            RSwitchDaemon().serve()
+
+
+# =============================================================================
+# Daemon management
+# =============================================================================
+def _socket_path() -> str:
+    return os.path.join(RUNTIME_DIR, DAEMON_SOCKET)
+
+
+def _pid_path() -> str:
+    return os.path.join(RUNTIME_DIR, DAEMON_PID_FILE)
+
+
+def _daemon_pid() -> int | None:
+    """
+    Return the pid of the running daemon, or None if there's none
+    """
+    if not runtime_dir_ok():
+        return None
+    try:
+        with open(_pid_path(), "r") as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+    return pid
+
+
+def _start() -> None:
+    pid = _daemon_pid()
+    if pid is not None:
+        Shell.warning(f"The rosswitch daemon is already running (pid {pid})")
+        return
+    if not runtime_dir_ok(create=True):
+        raise RuntimeError(
+            f"The runtime directory {RUNTIME_DIR} is not private to the current user, refusing to use it!"
+        )
+
+    subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(INSTALL_DIR, "bin", ".rosswitch_py.py"),
+            Commands.DAEMON.value,
+            DaemonChoices.RUN.value,
+        ],
+        cwd=os.path.join(INSTALL_DIR, "bin"),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if _daemon_pid() is not None and os.path.exists(_socket_path()):
+            Shell.txt(f"Started the rosswitch daemon (pid {_daemon_pid()})")
+            return
+        time.sleep(0.05)
+    raise RuntimeError("The rosswitch daemon couldn't be started!")
+
+
+def _stop() -> None:
+    pid = _daemon_pid()
+    if pid is None:
+        Shell.warning("The rosswitch daemon is not running")
+        return
+
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline and _daemon_pid() is not None:
+        time.sleep(0.05)
+    Shell.txt(f"Stopped the rosswitch daemon (pid {pid})")
+
+
+# =============================================================================
+# Server
+# =============================================================================
+class RSwitchDaemon:
+    """
+    Resident server answering the requests of the shell wrapper on a Unix
+    socket, so that the interpreter startup and imports, the profile index and
+    the parsed profiles are kept warm between two switches.
+
+    A request is a NUL separated list of fields, the first one being the
+    number of fields that follows: the forwarded environment as KEY=VALUE
+    fields, a `--` separator, then the command line arguments. The reply is
+    an empty record (ignored by the client) followed by the messages a one-shot
+    `.rosswitch_py.py` process would have written. An empty reply asks the
+    client to fall back on the one-shot process, which is only done as long as
+    the command hasn't started (its side effects would happen twice).
+    """
+
+    def __init__(self) -> None:
+        self._sources_stamp: Dict[str, int] = {}
+        self._is_outdated()
+        self._running = True
+
+    def serve(self) -> None:
+        # The replies are built from the buffered messages
+        Shell.set_stream(None)
+        if not runtime_dir_ok(create=True):
+            raise RuntimeError(
+                f"The runtime directory {RUNTIME_DIR} is not private to the current user, refusing to use it!"
+            )
+        path = _socket_path()
+        if os.path.exists(path):
+            os.unlink(path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        os.chmod(path, 0o600)
+        server.listen(16)
+        with open(_pid_path(), "w") as f:
+            f.write(str(os.getpid()))
+
+        def on_terminate(signum, frame):
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, on_terminate)
+        try:
+            while self._running:
+                conn, _ = server.accept()
+                with conn:
+                    self._handle(conn)
+        finally:
+            server.close()
+            for f in (path, _pid_path()):
+                if os.path.exists(f):
+                    os.unlink(f)
+
+    def _handle(self, conn: socket.socket) -> None:
+        conn.settimeout(REQUEST_TIMEOUT)
+        try:
+            env, args = RSwitchDaemon._read_request(conn)
+        except (OSError, ValueError):
+            return
+
+        # Stop serving (and let the client fall back) if the tool was updated
+        if self._is_outdated():
+            self._running = False
+            return
+
+        try:
+            conn.sendall(self._run(env, args).encode())
+        except OSError:
+            pass
+
+    def _run(self, env: Dict[str, str], args: List[str]) -> str:
+        """
+        Run the command in this process, with the environment of the client
+        """
+        from .dispatch import run
+
+        if RSwitchDaemon._command(args) in LOCAL_COMMANDS:
+            return ""
+
+        for key in FORWARDED_ENV:
+            if len(env.get(key, "")) != 0:
+                os.environ[key] = env[key]
+            else:
+                os.environ.pop(key, None)
+        PRESET_PATHS[:] = setup_paths()
+
+        Shell.flush()
+        try:
+            args = Timings.setup(args)
+        except Exception:
+            return ""
+        try:
+            with Timings.phase("command"):
+                run(args)
+        except SystemExit:
+            # Invalid arguments, rejected before running the command: the usage
+            # is written by the one-shot process
+            Timings.report()
+            Shell.flush()
+            return ""
+        except Exception as e:
+            Shell.error(f"{type(e).__name__}: {e}")
+        Timings.report()
+        return "\0\0" + Shell.flush()
+
+    @staticmethod
+    def _command(args: List[str]) -> str | None:
+        """
+        The command of a command line (its first argument after the global
+        options), None if there's none
+        """
+        skip = False
+        for arg in args:
+            if skip:
+                skip = False
+            elif arg == CPROFILE_FLAG:
+                skip = True
+            elif not arg.startswith("-"):
+                return arg
+        return None
+
+    @staticmethod
+    def _read_request(conn: socket.socket) -> Tuple[Dict[str, str], List[str]]:
+        data = b""
+        n_fields = None
+        while n_fields is None or data.count(b"\0") < n_fields + 1:
+            chunk = conn.recv(4096)
+            if len(chunk) == 0:
+                raise ValueError("Incomplete request")
+            data += chunk
+            if n_fields is None and b"\0" in data:
+                n_fields = int(data.split(b"\0", 1)[0])
+
+        fields = data.decode().split("\0")[1 : n_fields + 1]
+        sep = fields.index(ENV_SEPARATOR)
+        env = dict(f.split("=", 1) for f in fields[:sep] if "=" in f)
+        return env, fields[sep + 1 :]
+
+    def _is_outdated(self) -> bool:
+        """
+        Return True if one of the modules of the package loaded by the daemon
+        was modified since it was imported (only the loaded ones are checked,
+        so that no directory is walked on each request)
+        """
+        package_dir = os.path.dirname(os.path.dirname(__file__))
+        for module in list(sys.modules.values()):
+            fpath = getattr(module, "__file__", None)
+            if fpath is None or not fpath.startswith(package_dir):
+                continue
+            try:
+                mtime = os.stat(fpath).st_mtime_ns
+            except OSError:
+                return True
+            if self._sources_stamp.setdefault(fpath, mtime) != mtime:
+                return True
+        return False
@@ -0,0 +1,234 @@
+from argparse import ArgumentParser, BooleanOptionalAction
+from typing import List
+
+from .cmd_list import Commands
+from .load import load
+from .unload import unload
+from .list import JSON_FORMAT, PLAIN_FORMAT, list_configs
+from .gen import generate_files
+from .new import new_profile
+from .tools import tools_section, ToolsChoices
+from .daemon import daemon_section, DaemonChoices
+from .watch import watch
+from ..common import Shell
+from ..utils.timing import Timings
+
+
+def setup_parser() -> ArgumentParser:
+    """
+    Setup the argument parser for the program
+
+    Returns:
+        ArgumentParser: the configured parser
+    """
+    parser = ArgumentParser(prog="rosswitch")
+    parser.add_argument(
+        "-d",
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="display debug informations",
+    )
+    # Handled (and removed from the arguments) by Timings.setup
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="display the time spent in each phase of the command (or set RSWCH_TRACE)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="write cProfile statistics of the command to FILE (or set RSWCH_TRACE_PROFILE)",
+    )
+    sp = parser.add_subparsers(dest="command", required=True)
+
+    # Load configuration arguments
+    load_parser = sp.add_parser(Commands.LOAD.value, help=": load a custom profile")
+    load_parser.add_argument("name")
+    load_parser.add_argument(
+        "--full",
+        dest="full",
+        action="store_true",
+        help="unload the current profile before loading, instead of switching directly from it",
+    )
+
+    # Unload configuration arguments
+    unload_parser = sp.add_parser(
+        Commands.UNLOAD.value, help=": unload a custom profile"
+    )
+
+    # List configurations arguments
+    list_parser = sp.add_parser(
+        Commands.LIST.value, help=": list all known custom profiles"
+    )
+    list_format = list_parser.add_mutually_exclusive_group()
+    list_format.add_argument(
+        "--json",
+        dest="format",
+        action="store_const",
+        const=JSON_FORMAT,
+        help="print the profiles, their origin, the status of their scripts and the loaded one as JSON",
+    )
+    list_format.add_argument(
+        "--plain",
+        dest="format",
+        action="store_const",
+        const=PLAIN_FORMAT,
+        help="print the profiles names, one per line",
+    )
+
+    # Force regenerate a configuration arguments
+    # GenArgs.setup_parser(sp)  # type: ignore
+    gen_parser = sp.add_parser(
+        Commands.GEN.value,
+        help=": (re-)generate the files for the given profile",
+    )
+    gen_parser.add_argument("name")
+    gen_parser.add_argument(
+        "-f",
+        "--force",
+        dest="force",
+        action="store_true",
+        help="regenerate the files even if they are up to date",
+    )
+    gen_parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="number of presets generated in parallel with `all` (0 for one per CPU)",
+    )
+    gen_parser.add_argument(
+        "--freeze",
+        dest="freeze",
+        action=BooleanOptionalAction,
+        default=None,
+        help="source the workspaces at generation time and export the resulting environment (kept for the next regenerations)",
+    )
+    gen_parser.add_argument(
+        "--timed",
+        dest="timed",
+        action=BooleanOptionalAction,
+        default=None,
+        help="time the sections of the scripts and print a ranked breakdown when they run (kept for the next regenerations)",
+    )
+    gen_parser.add_argument(
+        "--prune",
+        dest="prune",
+        action=BooleanOptionalAction,
+        default=None,
+        help="leave the missing workspaces and paths out of the loading script (kept for the next regenerations)",
+    )
+
+    # Create a new configuration arguments
+    new_parser = sp.add_parser(
+        Commands.NEW.value,
+        help=": create a new profile with the given name",
+    )
+    new_parser.add_argument("name")
+
+    # Extend an existing configuration arguments
+    extend_parser = sp.add_parser(
+        Commands.EXTEND.value,
+        help=": create a new configuration based on the given one",
+    )
+    extend_parser.add_argument("parent")
+    extend_parser.add_argument("new")
+
+    debug_parser = sp.add_parser(
+        Commands.TOOLS.value, help=": internal tools for testing"
+    )
+    debug_parser.add_argument("tool_action", type=str, choices=ToolsChoices.get_vals())
+
+    daemon_parser = sp.add_parser(
+        Commands.DAEMON.value, help=": manage the resident rosswitch server"
+    )
+    daemon_parser.add_argument(
+        "daemon_action", type=str, choices=DaemonChoices.get_vals()
+    )
+
+    watch_parser = sp.add_parser(
+        Commands.WATCH.value,
+        help=": regenerate the outdated scripts as soon as their profiles or workspaces change",
+    )
+    watch_parser.add_argument(
+        "--poll",
+        dest="poll",
+        action="store_true",
+        help="poll the directories instead of using inotify",
+    )
+
+    return parser
+
+
+def run(argv: List[str]) -> None:
+    """
+    Parse the given command line and run the command, the output of the
+    command being stored in the Shell buffer.
+
+    Args:
+        argv (List[str]): the command line arguments (without the program name)
+    """
+    with Timings.phase("parser setup"):
+        parser = setup_parser()
+    argv = list(argv)
+
+    # If no command is provided, consider it as a configuration file
+    # This provide
+    if len(argv) == 1 and not Commands.is_value(argv[0]):
+        argv.insert(0, Commands.LOAD.value)
+
+    # Test for help (special case for the shell escaping)
+    if "-h" in argv or "--help" in argv:
+        Shell.txt(parser.format_help())
+        return
+
+    # Process arguments
+    with Timings.phase("arguments parsing"):
+        args = parser.parse_args(argv)
+
+    # Enable debug messages ?
+    Shell.enable_debug_msgs(args.debug)
+
+    # Run command
+    try:
+        match Commands(args.command):
+            case Commands.LOAD:
+                load(args.name, args.full)
+            case Commands.UNLOAD:
+                unload()
+            case Commands.LIST:
+                if args.format is None:
+                    Shell.print_header()
+                list_configs(args.format)
+            case Commands.GEN:
+                Shell.print_header()
+                generate_files(
+                    args.name,
+                    args.force,
+                    args.jobs,
+                    args.freeze,
+                    args.timed,
+                    args.prune,
+                )
+            case Commands.NEW:
+                Shell.print_header()
+                Shell.txt("Creating new configuration ...")
+                new_profile(args.name)
+            case Commands.EXTEND:
+                Shell.print_header()
+                Shell.txt("Making new configuration from parent ...")
+                new_profile(args.new, args.parent)
+            case Commands.TOOLS:
+                Shell.print_header()
+                tools_section(args.tool_action)
+            case Commands.DAEMON:
+                daemon_section(args.daemon_action)
+            case Commands.WATCH:
+                Shell.print_header()
+                watch(args.poll)
+            case _:
+                pass
+    except RuntimeError as e:
+        Shell.error(e.__str__())
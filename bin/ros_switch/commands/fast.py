@@ -0,0 +1,67 @@
+from typing import List
+import os
+
+from .cmd_list import Commands
+from .list import LIST_FORMATS, list_configs
+from .load import load
+from .unload import unload
+from .watch import watcher_ready
+from ..common import PresetData
+from ..common.constants import ENV_PRESET_NAME
+
+
+def run_fast(argv: List[str]) -> bool:
+    """
+    Run the load / unload commands without going through the argument parser,
+    when all the scripts involved are already generated and up to date, and
+    the machine-readable listings (`ls --json`, `ls --plain`). This path only
+    imports the profile index and the scripts metadata (no YAML parsing, no
+    generator and no colorama).
+
+    Args:
+        argv (List[str]): the command line arguments (without the program name)
+
+    Returns:
+        bool: True if the command has been run, False if it must go through
+            the full command dispatch
+    """
+    # Machine-readable listings, served from the profiles index
+    if len(argv) == 2 and argv[0] == Commands.LIST.value:
+        fmt = argv[1][2:] if argv[1].startswith("--") else None
+        if fmt not in LIST_FORMATS:
+            return False
+        list_configs(fmt)
+        return True
+
+    if len(argv) == 1 and argv[0] == Commands.UNLOAD.value:
+        to_load = None
+    elif len(argv) == 1 and not Commands.is_value(argv[0]):
+        to_load = argv[0]
+    elif len(argv) == 2 and argv[0] == Commands.LOAD.value:
+        to_load = argv[1]
+    else:
+        return False
+
+    # Scripts of the current preset
+    current_preset = os.getenv(ENV_PRESET_NAME)
+    if current_preset is not None:
+        preset = PresetData.find_profile(current_preset)
+        if preset is None or not preset.is_generated():
+            return False
+
+    # Scripts of the wanted preset
+    if to_load is None:
+        unload()
+        return True
+    if to_load.startswith("-"):
+        return False
+    # The scripts kept up to date by a watcher don't need to be checked
+    preset = PresetData.find_profile(to_load)
+    if preset is None or not (
+        preset.is_generated()
+        if watcher_ready() and preset.is_writable()
+        else preset.is_fresh()
+    ):
+        return False
+    load(to_load)
+    return True
@@ -1,3 +1,6 @@
+import os
+from typing import Any, Dict, Tuple
+
 from ..common.PresetData import PresetData
 from .cmd_list import Commands
 from ..utils.Arguments import ArgumentGroup
@@ -8,16 +11,99 @@ from ..common.ShellCom import Shell
 class GenArgs: ...
 
 
-def generate_files(config_name: str) -> None:
+def generate_files(
+    config_name: str,
+    force: bool = False,
+    jobs: int = 1,
+    freeze: bool | None = None,
+    timed: bool | None = None,
+    prune: bool | None = None,
+) -> None:
     Shell.txt(f"Generating files for preset {config_name}")
 
+    options = {
+        name: val
+        for name, val in (("freeze", freeze), ("timed", timed), ("prune", prune))
+        if val is not None
+    }
     if config_name == "all":
-        presets = PresetData.list_preset_files()
-        for _, p in presets.items():
-            p.generate_files()
+        _generate_all(force, jobs, options)
     else:
         preset = PresetData.find_profile(config_name)
         if preset is None:
             raise RuntimeError(f"The preset {config_name} couldn't be found !")
 
-        preset.generate_files()
+        preset.generate_files(force=force, options=options)
+
+        # The profiles extending this one are outdated if it changed
+        for child in preset.dependents():
+            Shell.txt(f"Generating files for preset {child.preset_name}")
+            child.generate_files(ignore_warnings=True)
+
+
+def _generate_all(force: bool, jobs: int, options: Dict[str, Any]) -> None:
+    """
+    Generate the files of all known presets, on a pool of `jobs` worker
+    processes (0 for one per CPU). The messages of each preset are reported
+    in the listing order, and a failing preset doesn't stop the others.
+    """
+    presets = list(PresetData.list_preset_files().values())
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(presets))
+
+    args = [(p, force, options, Shell._IN_DEBUG) for p in presets]
+    failed = []
+    n_generated = 0
+
+    def report(preset: PresetData, result: Tuple[bool | None, str]) -> None:
+        nonlocal n_generated
+        generated, messages = result
+        Shell.forward(messages)
+        if generated is None:
+            failed.append(preset.preset_name)
+        elif generated:
+            n_generated += 1
+
+    # The messages of each preset are forwarded as soon as it is generated
+    if jobs <= 1:
+        for preset, a in zip(presets, args):
+            report(preset, _generate_preset(*a))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(_generate_preset, *zip(*args))
+            for preset, result in zip(presets, results):
+                report(preset, result)
+
+    Shell.txt(
+        f"Generated {n_generated} presets ({len(presets) - n_generated - len(failed)} up to date)"
+    )
+    if len(failed) != 0:
+        Shell.error(f"{len(failed)} presets failed: {', '.join(failed)}")
+
+
+def _generate_preset(
+    preset: PresetData, force: bool, options: Dict[str, Any], debug: bool
+) -> Tuple[bool | None, str]:
+    """
+    Generate the files of a single preset, capturing its messages.
+
+    Returns:
+        Tuple[bool | None, str]: whether the files have been generated (None on
+            error) and the messages emitted during the generation
+    """
+    Shell.enable_debug_msgs(debug)
+    stream = Shell.set_stream(None)
+    previous = Shell.flush()
+    Shell.start_section(f"Preset {preset.preset_name}")
+    try:
+        generated = preset.generate_files(force=force, options=options)
+    except Exception as e:
+        Shell.error(f"Generation of preset {preset.preset_name} failed: {e}")
+        generated = None
+    messages = Shell.flush()
+    Shell.forward(previous)
+    Shell.set_stream(stream)
+    return generated, messages
@@ -1,23 +1,66 @@
-from colorama import Fore
+import json
+import os
 
 from ..common import Shell
 from ..common import PresetData
-from .cmd_list import Commands
-from ..utils.Arguments import ArgumentGroup
+from ..common.constants import ENV_PRESET_NAME
+from .watch import watcher_ready
 
 
 ADMIN_SECTION = "Admin configuration"
 USER_SECTION = "User configurations"
 
+# Machine-readable output formats (`--json`, `--plain`)
+JSON_FORMAT = "json"
+PLAIN_FORMAT = "plain"
+LIST_FORMATS = [JSON_FORMAT, PLAIN_FORMAT]
 
-@ArgumentGroup(Commands.LIST.value, ": list all known custom profiles")
-class ListArgs: ...
+# Status of the scripts of a profile
+GENERATED = "generated"
+STALE = "stale"
+MISSING = "missing"
 
 
-def list_configs() -> None:
+def list_configs(fmt: str | None = None) -> None:
+    """
+    List the known profiles, from the profiles index (no profile is parsed)
+
+    Args:
+        fmt (str | None): the machine-readable format to print the profiles
+            in (see LIST_FORMATS), None for the human-readable listing
+    """
     # Get configs
     files = PresetData.list_preset_files()
 
+    if fmt == PLAIN_FORMAT:
+        for preset_name in files.keys():
+            Shell.txt(preset_name)
+        return
+    if fmt == JSON_FORMAT:
+        current = os.getenv(ENV_PRESET_NAME)
+        watched = watcher_ready()
+        profiles = [
+            {
+                "name": preset_name,
+                "file": data.preset_file,
+                "origin": "admin" if data.is_admin else "user",
+                "status": _status(data, watched),
+                "loaded": preset_name == current,
+            }
+            for preset_name, data in files.items()
+        ]
+        Shell.txt(json.dumps({"current": current, "profiles": profiles}))
+        return
+
+    from colorama import Fore
+
+    labels = {
+        GENERATED: f"[{Fore.GREEN}{'OK'.center(7)}{Fore.RESET}]",
+        STALE: f"[{Fore.YELLOW}{'STALE'.center(7)}{Fore.RESET}]",
+        MISSING: f"[{Fore.RED}{'NOT GEN'.center(7)}{Fore.RESET}]",
+    }
+    watched = watcher_ready()
+
     # Export files as list
     Shell.txt(f"Found {len(files)} configurations")
     Shell.start_section(ADMIN_SECTION)
@@ -25,11 +68,7 @@ def list_configs() -> None:
     for preset_name, data in files.items():
         if data.is_admin:
             has_one = True
-            pre = (
-                f"[{Fore.GREEN}{'OK'.center(7)}{Fore.RESET}]"
-                if data.is_generated()
-                else f"[{Fore.RED}{'NOT GEN'.center(7)}{Fore.RESET}]"
-            )
+            pre = labels[_status(data, watched)]
             Shell.txt(f"\t- {pre} {preset_name} -> {data.preset_file}")
     if not has_one:
         Shell.txt("\tNo admin configurations found")
@@ -39,11 +78,22 @@ def list_configs() -> None:
     for preset_name, data in files.items():
         if not data.is_admin:
             has_one = True
-            pre = (
-                f"[{Fore.GREEN}{'OK'.center(7)}{Fore.RESET}]"
-                if data.is_generated()
-                else f"[{Fore.RED}{'NOT GEN'.center(7)}{Fore.RESET}]"
-            )
+            pre = labels[_status(data, watched)]
             Shell.txt(f"\t- {pre} {preset_name} -> {data.preset_file}")
     if not has_one:
         Shell.txt("\tNo user configurations found")
+
+
+# =============================================================================
+# Helpers function
+# =============================================================================
+def _status(preset: PresetData, watched: bool) -> str:
+    """
+    Status of the scripts of a profile, checked from their metadata (the
+    scripts kept up to date by a watcher are not checked)
+    """
+    if not preset.is_generated():
+        return MISSING
+    if (watched and preset.is_writable()) or preset.is_fresh():
+        return GENERATED
+    return STALE
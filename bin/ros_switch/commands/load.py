@@ -2,21 +2,23 @@ import os
 
 from .cmd_list import Commands
 from ..common import PresetData
+from ..common.EnvSnapshot import EnvSnapshot
+from ..common.ScriptMeta import ScriptMeta
+from ..common.constants import ENV_PRESET_NAME, ENV_RESOLVED_PRE
 from ..common import Shell
 from ..utils.Arguments import ArgumentGroup
+from ..utils.timing import Timings
 
 from .unload import unload
+from .watch import watcher_ready
 
 
 @ArgumentGroup(Commands.LOAD.value)
 class LoadArgs: ...
 
 
-def load(config_name: str) -> None:
-    # Unload any current preset if there's any
-    unload()
-
-    # Load the wanted preset
+def load(config_name: str, full: bool = False) -> None:
+    # Find the wanted preset
     preset = PresetData.find_profile(config_name)
     if preset is None:
         raise RuntimeError(f"No preset is found with the name `{config_name}`")
@@ -29,5 +31,63 @@ def load(config_name: str) -> None:
             f"The scripts for the preset `{config_name}` have not been generated!"
         )
         preset.generate_files()
+    elif not (watcher_ready() and preset.is_writable()) and not preset.is_fresh():
+        Shell.warning(f"The scripts for the preset `{config_name}` are outdated!")
+        preset.generate_files(ignore_warnings=True)
+
+    # Switch directly from the current preset if possible, or unload it
+    script = None if full else _transition(preset)
+    if script is None:
+        unload()
+        script = preset.install_script
+
+    EnvSnapshot.prepare()
+    with Timings.phase("addresses resolution"):
+        _resolve_addresses(preset.install_script)
+    Shell.load(script)
+
+
+def _transition(preset: PresetData) -> str | None:
+    """
+    Get the script switching from the current preset to the given one, if the
+    environment of the shell matches the current version of the scripts of the
+    current preset, and if they are up to date
+
+    Returns:
+        str | None: the path to the transition script, or None if the current
+            preset has to be unloaded first
+    """
+    current_preset = os.getenv(ENV_PRESET_NAME)
+    if current_preset is None:
+        return None
+    current = PresetData.find_profile(current_preset)
+    if (
+        current is None
+        or current.preset_file == preset.preset_file
+        or not current.is_generated()
+        or not EnvSnapshot.is_newer(current.install_script)  # type: ignore
+        or not (watcher_ready() or current.is_fresh())
+    ):
+        return None
+    with Timings.phase("transition"):
+        try:
+            return current.transition_script(preset)
+        except RuntimeError as e:
+            Shell.debug(f"No transition from {current_preset}: {e}")
+            return None
+
+
+def _resolve_addresses(install_script: str) -> None:
+    """
+    Resolve the interface addresses the loading script needs (e.g. ROS_IP), so
+    that it doesn't have to look for them itself
+    """
+    meta = ScriptMeta.read(install_script)
+    if meta is None or len(meta.resolve) == 0:
+        return
+    from ..common.Network import Network
 
-    Shell.load(preset.install_script)
+    for var, pattern in meta.resolve.items():
+        ip = Network.resolve(pattern)
+        if ip is not None:
+            Shell.env(f"{ENV_RESOLVED_PRE}{var}", ip)
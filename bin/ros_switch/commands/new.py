@@ -0,0 +1,50 @@
+import os
+import time
+
+import yaml
+
+from ..common import PresetData
+from ..common.PresetData import PathType
+from ..common.constants import PRESET_DIR
+from ..common import Shell
+
+
+def new_profile(name: str, parent_name: str | None = None) -> None:
+    """
+    Create a new profile in the user profiles directory, extending the given
+    parent profile if any
+
+    Args:
+        name (str): the name of the new profile
+        parent_name (str | None): the name of the profile to extend
+    """
+    if PresetData.find_profile(name) is not None:
+        raise RuntimeError(f"A preset already exists with the name `{name}`")
+
+    preset = {}
+    if parent_name is not None:
+        parent = PresetData.find_profile(parent_name)
+        if parent is None:
+            raise RuntimeError(f"No preset is found with the name `{parent_name}`")
+        preset["extends"] = parent.preset_name
+        description = f"Based on {parent.preset_name}"
+    else:
+        preset["ros_version"] = 2
+        description = ""
+    preset["metadata"] = {
+        "author": os.getenv("USER", ""),
+        "date": time.strftime("%m/%Y"),
+        "description": description,
+    }
+
+    user_path = next(PresetData.path_iter(PathType.USER), None)
+    if user_path is None:
+        raise RuntimeError("No user profiles directory is configured")
+    profile_file = os.path.join(
+        user_path[0], PRESET_DIR, PresetData.preset_name2preset_file(name)
+    )
+    os.makedirs(os.path.dirname(profile_file), exist_ok=True)
+    with open(profile_file, "x") as f:
+        # Dumped by yaml, so that the names are quoted and escaped as needed
+        yaml.safe_dump({"preset": preset}, f, indent=4, sort_keys=False)
+    Shell.txt(f"Created the preset {name} in {profile_file}")
@@ -1,11 +1,23 @@
 from enum import Enum
-from typing import List
+from typing import Dict, List
 
 from ..common.ShellCom import Shell
 
+# Modules that must not be imported when loading already generated profiles
+FAST_PATH_MODULE = "ros_switch.commands.fast"
+FAST_PATH_FORBIDDEN = [
+    "yaml",
+    "colorama",
+    "argparse",
+    "ros_switch.common.generator",
+    "ros_switch.common.PresetConfig",
+]
+FAST_PATH_BUDGET_US = 60000
+
 
 class ToolsChoices(Enum):
     COLORS = "colors"
+    IMPORTS = "imports"
 
     @staticmethod
     def get_vals() -> List[str]:
@@ -19,6 +31,8 @@ def tools_section(tool_action: str):
         match act:
             case ToolsChoices.COLORS:
                 _display_colors()
+            case ToolsChoices.IMPORTS:
+                _check_imports()
 
     except:
         Shell.error(f"Unknown tool action: `{tool_action}`")
@@ -40,3 +54,63 @@ def _display_colors():
         Shell.txt(
             f"{f'{v.value} '.ljust(20, '.')} -> {txt.format(c.term_color, c.BASH_SUFFIX)}"
         )
+
+
+def _import_times(statement: str) -> Dict[str, int]:
+    """
+    Run the statement in a new interpreter with `-X importtime`
+
+    Returns:
+        Dict[str, int]: the self import time (in us) of each imported module
+    """
+    import os
+    import subprocess
+    import sys
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if self_us.strip().isnumeric():
+            times[name.strip()] = int(self_us)
+    return times
+
+
+def _check_imports():
+    """
+    Check that the load / unload fast path only imports what it needs, and
+    that its import time stays in the budget
+    """
+    baseline = _import_times("pass")
+    times = {
+        k: v
+        for k, v in _import_times(f"import {FAST_PATH_MODULE}").items()
+        if k not in baseline
+    }
+
+    Shell.start_section("Fast path imports")
+    ok = True
+    for name in times.keys():
+        for forbidden in FAST_PATH_FORBIDDEN:
+            if name == forbidden or name.startswith(f"{forbidden}."):
+                Shell.error(f"The fast path imports `{name}`")
+                ok = False
+
+    total = sum(times.values())
+    Shell.txt(f"\t-> {len(times)} modules imported in {total / 1000:.1f} ms")
+    for name, t in sorted(times.items(), key=lambda v: v[1], reverse=True)[:10]:
+        Shell.txt(f"\t\t{f'{name} '.ljust(40, '.')} {t / 1000:.1f} ms")
+    if total > FAST_PATH_BUDGET_US:
+        Shell.error(
+            f"The fast path imports exceed the budget of {FAST_PATH_BUDGET_US / 1000:.1f} ms"
+        )
+        ok = False
+    if ok:
+        Shell.txt("\t-> The fast path imports are within the budget")
@@ -1,18 +1,24 @@
 import os
 
 from ..common import PresetData
-from ..common.generator.ScriptGenerator import Vars
+from ..common.EnvSnapshot import EnvSnapshot
+from ..common.constants import ENV_PRESET_NAME
 from ..common import Shell
+from ..utils.timing import Timings
 
 
 def unload():
     # Fetch the env var that contains the current loaded preset (if there's one)
     # If there's one, unload it before loading the new one
-    current_preset = os.getenv(Vars.PRESET_NAME)
+    current_preset = os.getenv(ENV_PRESET_NAME)
     if current_preset is not None:
         preset = PresetData.find_profile(current_preset)
         if preset is None:
             raise RuntimeError("Current preset loaded cannot be found on known paths!")
         if preset.uninstall_script is None or not preset.is_generated():
             raise RuntimeError("Current preset does not have a known unload script!")
+
+        # The unloading script restores the snapshot if there's one
+        with Timings.phase("restore script"):
+            EnvSnapshot.make_restore_script()
         Shell.load(preset.uninstall_script)
@@ -0,0 +1,225 @@
+from typing import Dict, Set
+import os
+import signal
+import time
+
+from ..common import PresetData
+from ..common.ScriptMeta import ScriptMeta
+from ..common.ShellCom import Shell
+from ..common.constants import (
+    PRESET_DIR,
+    PRESET_PATHS,
+    RUNTIME_DIR,
+    WATCH_PENDING_FILE,
+    WATCH_PID_FILE,
+    runtime_dir_ok,
+)
+
+# Quiet time closing a burst of changes (e.g. a colcon build), in seconds
+WATCH_DEBOUNCE = 1.0
+# Period of the polling fallback, in seconds
+POLL_INTERVAL = 2.0
+
+
+def watch(poll: bool = False) -> None:
+    """
+    Keep the scripts of every profile up to date: the profiles directories and
+    the paths stamped in the scripts (e.g. the workspaces of frozen profiles)
+    are watched, and the outdated scripts are regenerated once a burst of
+    changes is over. While the watcher runs with no pending change (and no
+    profile failing to generate), the loadings don't check the freshness of
+    the scripts.
+
+    Args:
+        poll (bool): poll the directories instead of using inotify
+    """
+    from ..utils.fswatch import make_watcher
+
+    pid = watcher_pid()
+    if pid is not None:
+        raise RuntimeError(f"The profiles are already watched (pid {pid})")
+
+    if not runtime_dir_ok(create=True):
+        raise RuntimeError(
+            f"The runtime directory {RUNTIME_DIR} is not private to the current user, refusing to use it!"
+        )
+    with open(_pid_path(), "w") as f:
+        f.write("\n".join([str(os.getpid())] + [root for root, _ in PRESET_PATHS]))
+
+    def on_terminate(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, on_terminate)
+    watcher = make_watcher(POLL_INTERVAL, poll)
+    Shell.txt(f"Watching the profiles and their workspaces ({watcher.name})")
+    failures: Dict[str, str] = {}
+    try:
+        while True:
+            _set_pending(True)
+            # Watched before the refresh, so that no change is missed
+            watcher.update(_watched_paths())
+            _refresh(failures)
+            watcher.update(_watched_paths())
+            # The scripts of the profiles that failed to generate are outdated,
+            # so the loadings keep checking the freshness until they are fixed
+            _set_pending(len(failures) != 0)
+
+            watcher.wait(None)
+            _set_pending(True)
+            while watcher.wait(WATCH_DEBOUNCE):
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        for f in (_pid_path(), _pending_path()):
+            if os.path.exists(f):
+                os.unlink(f)
+        Shell.txt("Stopped watching the profiles")
+
+
+def watcher_pid() -> int | None:
+    """
+    Return the pid of the running watcher, or None if there's none
+    """
+    if not runtime_dir_ok():
+        return None
+    try:
+        with open(_pid_path(), "r") as f:
+            pid = int(f.readline().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+    return pid
+
+
+def watcher_ready() -> bool:
+    """
+    Return True if a watcher keeps the scripts of the profiles of this shell
+    up to date, and has no change to process nor profile failing to generate.
+    Only the generated and writable profiles are kept up to date (see
+    PresetData.is_writable).
+    """
+    if not runtime_dir_ok() or os.path.exists(_pending_path()):
+        return False
+    try:
+        with open(_pid_path(), "r") as f:
+            lines = f.read().split("\n")
+        os.kill(int(lines[0]), 0)
+    except (OSError, ValueError):
+        return False
+    return lines[1:] == [root for root, _ in PRESET_PATHS]
+
+
+# =============================================================================
+# Helpers function
+# =============================================================================
+def _pid_path() -> str:
+    return os.path.join(RUNTIME_DIR, WATCH_PID_FILE)
+
+
+def _pending_path() -> str:
+    return os.path.join(RUNTIME_DIR, WATCH_PENDING_FILE)
+
+
+def _set_pending(pending: bool) -> None:
+    """
+    Mark the scripts as possibly outdated (a change is being processed)
+    """
+    path = _pending_path()
+    if pending:
+        with open(path, "w"):
+            pass
+    elif os.path.exists(path):
+        os.unlink(path)
+
+
+def _refresh(failures: Dict[str, str]) -> None:
+    """
+    Regenerate the outdated scripts. Only the profiles already generated in a
+    writable location are kept up to date (the other ones would always fail to
+    generate). The errors of a profile are only reported when they differ from
+    the ones of its previous generation.
+
+    Args:
+        failures (Dict[str, str]): the errors of the profiles that failed to
+            generate, as {profile file: messages}
+    """
+    from .gen import _generate_preset
+
+    for preset in PresetData.list_preset_files().values():
+        if not preset.is_generated() or not preset.is_writable():
+            failures.pop(preset.preset_file, None)
+            continue
+        if preset.is_fresh():
+            # e.g. a failing profile restored as it was
+            failures.pop(preset.preset_file, None)
+            continue
+        generated, messages = _generate_preset(preset, False, {}, Shell._IN_DEBUG)
+        if generated is None:
+            if failures.get(preset.preset_file) != messages:
+                Shell.forward(messages)
+            failures[preset.preset_file] = messages
+            continue
+
+        failures.pop(preset.preset_file, None)
+        if generated:
+            Shell.txt(
+                f"[{time.strftime('%H:%M:%S')}] Regenerated the scripts of preset {preset.preset_name}"
+            )
+
+
+def _watched_paths() -> Dict[str, Set[str] | None]:
+    """
+    Compute the directories to watch: the profiles trees, and the sources, the
+    workspaces setup files and the paths stamped in the generated scripts. For
+    a missing path, its nearest existing ancestor is watched for its creation.
+
+    Returns:
+        Dict[str, Set[str] | None]: the watched directories, as {directory:
+            names of interest in it, None for any change}
+    """
+    watched: Dict[str, Set[str] | None] = {}
+    for root, _ in PRESET_PATHS:
+        profiles_dir = os.path.join(root, PRESET_DIR)
+        if os.path.isdir(profiles_dir):
+            for dpath, _, _ in os.walk(profiles_dir):
+                _watch(watched, dpath, None)
+        else:
+            _watch_creation(watched, profiles_dir)
+
+    for preset in PresetData.list_preset_files().values():
+        if not preset.is_generated():
+            continue
+        meta = ScriptMeta.read(preset.install_script)  # type: ignore
+        if meta is None:
+            continue
+        for path in meta.sources + list(meta.layout.keys()):
+            _watch_creation(watched, path)
+        for path in meta.stamps.keys():
+            if os.path.isdir(path):
+                _watch(watched, path, None)
+            else:
+                _watch_creation(watched, path)
+    return watched
+
+
+def _watch(
+    watched: Dict[str, Set[str] | None], path: str, names: Set[str] | None
+) -> None:
+    if path in watched:
+        current = watched[path]
+        watched[path] = None if current is None or names is None else current | names
+    else:
+        watched[path] = None if names is None else set(names)
+
+
+def _watch_creation(watched: Dict[str, Set[str] | None], path: str) -> None:
+    """
+    Watch the nearest existing ancestor of a path for the creation (or the
+    change) of the entry leading to it
+    """
+    parent, name = os.path.split(path)
+    while not os.path.isdir(parent) and os.path.dirname(parent) != parent:
+        parent, name = os.path.split(parent)
+    _watch(watched, parent, {name})
@@ -0,0 +1,142 @@
+from typing import TYPE_CHECKING, Dict, Tuple
+import hashlib
+import os
+
+from .constants import CACHE_DIR, CONFIGS_CACHE_DIR, CONFIGS_REVISION, VERSION
+
+if TYPE_CHECKING:
+    from .PresetConfig import PresetConfig
+
+
+class ConfigCache:
+    """
+    Disk cache of the parsed profiles, so that the generation of unchanged
+    profiles doesn't parse their YAML file again.
+
+    Each profile is cached in its own file, holding a pickled header (tool
+    version and profiles classes revision, profile path, stamp and content hash
+    of each source file: the profile and the profiles it extends) followed by
+    the pickled PresetConfig. The header is checked before the configuration is
+    unpickled: the entry is valid if the stamps of the sources didn't change,
+    or if their content is the same (e.g. a file has only been touched).
+    """
+
+    @staticmethod
+    def digest(preset_file: str) -> str | None:
+        """
+        Hash the content of a profile file
+
+        Args:
+            preset_file (str): the path to the profile file
+
+        Returns:
+            str | None: the hash, or None if the file can't be read
+        """
+        try:
+            with open(preset_file, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    @staticmethod
+    def get(
+        preset_file: str,
+    ) -> "Tuple[PresetConfig, Dict[str, Tuple[int, int]]] | None":
+        """
+        Get the cached configuration of a profile
+
+        Args:
+            preset_file (str): the path to the profile file
+
+        Returns:
+            Tuple[PresetConfig, Dict[str, Tuple[int, int]]] | None: the
+                configuration and the current stamps of its sources (the
+                profile file and the files of its parents), or None if there's
+                no valid entry
+        """
+        import pickle
+
+        path = ConfigCache._entry_path(preset_file)
+        try:
+            with open(path, "rb") as f:
+                header = pickle.load(f)
+                if (
+                    not isinstance(header, dict)
+                    or header.get("version") != f"{VERSION}-{CONFIGS_REVISION}"
+                    or header.get("file") != preset_file
+                ):
+                    return None
+                sources: Dict[str, Tuple[Tuple[int, int], str | None]] = {}
+                touched = False
+                for src, (stamp, digest) in header["sources"].items():
+                    current = ConfigCache.stamp(src)
+                    if current != tuple(stamp):
+                        if digest is None or ConfigCache.digest(src) != digest:
+                            return None
+                        touched = True
+                    sources[src] = (current, digest)
+                config = pickle.load(f)
+        except Exception:
+            # Missing, truncated or incompatible entry
+            return None
+
+        if touched:
+            ConfigCache.put(preset_file, sources, config)
+        return config, {src: stamp for src, (stamp, _) in sources.items()}
+
+    @staticmethod
+    def put(
+        preset_file: str,
+        sources: Dict[str, Tuple[Tuple[int, int], str | None]],
+        config: "PresetConfig",
+    ) -> None:
+        """
+        Cache the configuration of a profile. The cache is optional, so failing
+        to write it is not an error.
+
+        Args:
+            preset_file (str): the path to the profile file
+            sources (Dict[str, Tuple[Tuple[int, int], str | None]]): the files
+                the configuration was parsed from, as {path: (stamp, hash)}
+                (see `stamp` and `digest`)
+            config (PresetConfig): the parsed configuration
+        """
+        import pickle
+
+        path = ConfigCache._entry_path(preset_file)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        header = {
+            "version": f"{VERSION}-{CONFIGS_REVISION}",
+            "file": preset_file,
+            "sources": {
+                src: (list(stamp), digest) for src, (stamp, digest) in sources.items()
+            },
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @staticmethod
+    def stamp(path: str) -> Tuple[int, int]:
+        """
+        Stamp of a file, as (mtime, size), or (0, 0) if it doesn't exist
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (0, 0)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def _entry_path(preset_file: str) -> str:
+        key = hashlib.sha1(os.path.abspath(preset_file).encode()).hexdigest()
+        return os.path.join(CACHE_DIR, CONFIGS_CACHE_DIR, f"{key}.pickle")
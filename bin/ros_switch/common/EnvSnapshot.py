@@ -0,0 +1,195 @@
+from typing import Dict, List
+import os
+
+from .constants import (
+    ENV_RESOLVED_PRE,
+    ENV_SHELL_PID,
+    RESTORE_FILE,
+    RUNTIME_DIR,
+    SNAPSHOT_FILE,
+    runtime_dir_ok,
+)
+
+# Variables changed by the shell itself, never restored
+IGNORED_VARS = ["_", "PWD", "OLDPWD", "SHLVL"]
+
+
+class EnvSnapshot:
+    """
+    Snapshots of the environment of a shell, taken by the loading script before
+    and after loading a profile (as `env -0` dumps in the runtime directory,
+    per shell PID).
+
+    At unloading, the variables touched by the loading are restored to their
+    value before the loading by a single generated script, instead of removing
+    the workspaces from each path variable. The snapshots are deleted once the
+    restore script is built, and the restore script deletes itself once sourced.
+    """
+
+    @staticmethod
+    def snapshot_path(pid: str, stage: str) -> str:
+        return os.path.join(RUNTIME_DIR, SNAPSHOT_FILE.format(pid=pid, stage=stage))
+
+    @staticmethod
+    def restore_path(pid: str) -> str:
+        return os.path.join(RUNTIME_DIR, RESTORE_FILE.format(pid=pid))
+
+    @staticmethod
+    def prepare() -> None:
+        """
+        Create the runtime directory the loading script writes its snapshots in,
+        and remove the files left by the shells that have exited
+        """
+        if runtime_dir_ok(create=True):
+            EnvSnapshot._clean_stale()
+
+    @staticmethod
+    def is_newer(script: str) -> bool:
+        """
+        Return True if the calling shell has a snapshot of the environment taken
+        after a loading, newer than the given loading script (the environment
+        of the shell then matches the current version of the script)
+
+        Args:
+            script (str): the path to the loading script
+
+        Returns:
+            bool: True if the snapshot is newer than the script
+        """
+        pid = os.getenv(ENV_SHELL_PID)
+        if pid is None or len(pid) == 0:
+            return False
+        try:
+            snapshot = os.stat(EnvSnapshot.snapshot_path(pid, "post")).st_mtime_ns
+            return snapshot >= os.stat(script).st_mtime_ns
+        except OSError:
+            return False
+
+    @staticmethod
+    def read(path: str) -> Dict[str, str] | None:
+        """
+        Read an environment snapshot
+
+        Args:
+            path (str): the path to the `env -0` dump
+
+        Returns:
+            Dict[str, str] | None: the environment, or None if there's no valid snapshot
+        """
+        try:
+            with open(path, "rb") as f:
+                raw = f.read().decode(errors="surrogateescape")
+        except OSError:
+            return None
+        if len(raw) == 0:
+            return None
+        return dict(e.split("=", 1) for e in raw.split("\0") if "=" in e)
+
+    @staticmethod
+    def make_restore_script() -> str | None:
+        """
+        Consume the snapshots of the calling shell and write the script
+        restoring the environment it had before the loading.
+
+        Returns:
+            str | None: the path to the restore script, or None if the shell
+                has no snapshot (the unloading script then falls back on
+                cleaning the environment from the profile description)
+        """
+        pid = os.getenv(ENV_SHELL_PID)
+        if pid is None or len(pid) == 0 or not runtime_dir_ok():
+            return None
+        restore = EnvSnapshot.restore_path(pid)
+        pre_path = EnvSnapshot.snapshot_path(pid, "pre")
+        post_path = EnvSnapshot.snapshot_path(pid, "post")
+        pre, post = EnvSnapshot.read(pre_path), EnvSnapshot.read(post_path)
+        for f in (restore, pre_path, post_path):
+            if os.path.exists(f):
+                os.unlink(f)
+        if pre is None or post is None:
+            return None
+
+        lines = ["# Environment restoration, generated by ros_switch"]
+        for name in sorted(pre.keys() | post.keys()):
+            if (
+                name in IGNORED_VARS
+                # Not a shell variable (e.g. the exported functions, BASH_FUNC_f%%)
+                or not (name.isascii() and name.isidentifier())
+                or name.startswith(ENV_RESOLVED_PRE)
+                or pre.get(name) == post.get(name)
+            ):
+                continue
+            lines += EnvSnapshot._restore_var(name, pre.get(name), post.get(name))
+        # The previous values may hold secrets, not kept once restored
+        lines.append(f"rm -f {EnvSnapshot._quote(restore)}")
+
+        tmp_path = f"{restore}.tmp"
+        with open(tmp_path, "w", errors="surrogateescape") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, restore)
+        return restore
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def _clean_stale() -> None:
+        """
+        Remove the snapshots and restore scripts of the shells that have exited
+        """
+        prefixes = {SNAPSHOT_FILE.split(".")[0], RESTORE_FILE.split(".")[0]}
+        try:
+            names = os.listdir(RUNTIME_DIR)
+        except OSError:
+            return
+        for name in names:
+            parts = name.split(".")
+            if len(parts) < 3 or parts[0] not in prefixes or not parts[1].isdigit():
+                continue
+            try:
+                os.kill(int(parts[1]), 0)
+            except ProcessLookupError:
+                try:
+                    os.unlink(os.path.join(RUNTIME_DIR, name))
+                except OSError:
+                    pass
+            except OSError:
+                pass
+
+    @staticmethod
+    def _quote(val: str) -> str:
+        return "'" + val.replace("'", "'\\''") + "'"
+
+    @staticmethod
+    def _restore_var(name: str, pre: str | None, post: str | None) -> List[str]:
+        """
+        Shell lines restoring a variable touched by the loading. A variable
+        left as the loading set it gets its previous value back. A path
+        variable modified after the loading only gets the part set by the
+        loading replaced. Other variables modified since are left untouched.
+        """
+        restore = (
+            f"unset {name}"
+            if pre is None
+            else f"export {name}={EnvSnapshot._quote(pre)}"
+        )
+        if post is None:
+            return [f'if [[ -z "${{{name}+x}}" ]]; then {restore}; fi']
+
+        lines = [
+            f'if [[ "${{{name}-}}" == {EnvSnapshot._quote(post)} ]]; then',
+            f"    {restore}",
+        ]
+        if name.endswith("PATH") and len(post) != 0:
+            lines += [
+                f'elif [[ -n "${{{name}-}}" ]]; then',
+                f"    _rswch_post={EnvSnapshot._quote(post)}",
+                f"    _rswch_pre={EnvSnapshot._quote('' if pre is None else pre)}",
+                f'    {name}=${{{name}/"$_rswch_post"/"$_rswch_pre"}}',
+                f"    {name}=${{{name}#:}}",
+                f"    {name}=${{{name}%:}}",
+                f"    export {name}",
+                "    unset _rswch_post _rswch_pre",
+            ]
+        lines.append("fi")
+        return lines
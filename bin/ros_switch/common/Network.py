@@ -0,0 +1,107 @@
+from typing import Dict
+import json
+import os
+import re
+import socket
+import struct
+import time
+
+from .constants import INTERFACES_FILE, OS_TYPE, OSType, RUNTIME_DIR, runtime_dir_ok
+
+# ioctl returning the IPv4 address of an interface, and the offset of the
+# address in the returned `struct ifreq` (same layout on Linux and macOS)
+match OS_TYPE:
+    case OSType.LINUX:
+        SIOCGIFADDR: int | None = 0x8915
+    case OSType.MACOS:
+        SIOCGIFADDR = 0xC0206921
+    case _:
+        SIOCGIFADDR = None
+IFREQ_SIZE = 32
+IFREQ_ADDR_OFFSET = 20
+
+# Lifetime of the cached interfaces addresses (in seconds)
+INTERFACES_TTL = 10
+DEFAULT_INTERFACE = "lo"
+
+
+class Network:
+    """
+    Resolution of the network interfaces addresses (for ROS_IP), done with
+    ioctls instead of parsing `ifconfig` in the shell. The addresses are cached
+    in the runtime directory for a few seconds.
+    """
+
+    @staticmethod
+    def interfaces() -> Dict[str, str]:
+        """
+        Get the IPv4 address of the network interfaces of this computer
+
+        Returns:
+            Dict[str, str]: a map (k,v) of {interface name: ip}, in the system order
+        """
+        # Only cached in a private runtime directory
+        if not runtime_dir_ok(create=True):
+            return Network._query_interfaces()
+        cache_path = os.path.join(RUNTIME_DIR, INTERFACES_FILE)
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if 0 <= time.time() - cached["time"] < INTERFACES_TTL:
+                return cached["interfaces"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        found = Network._query_interfaces()
+        try:
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"time": time.time(), "interfaces": found}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+        return found
+
+    @staticmethod
+    def resolve(pattern: str | None) -> str | None:
+        """
+        Get the address of the first interface whose name matches the given
+        pattern (as a regex search, like the shell `=~`)
+
+        Args:
+            pattern (str | None): the interface pattern (None for the loopback)
+
+        Returns:
+            str | None: the IPv4 address, or None if no interface matches (or
+                if the pattern is not a valid regex, left to the shell)
+        """
+        try:
+            regex = re.compile(DEFAULT_INTERFACE if pattern is None else pattern)
+        except re.error:
+            return None
+        for name, ip in Network.interfaces().items():
+            if regex.search(name):
+                return ip
+        return None
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def _query_interfaces() -> Dict[str, str]:
+        if SIOCGIFADDR is None:
+            return {}
+        import fcntl
+
+        found = {}
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for _, name in socket.if_nameindex():
+                ifreq = struct.pack(f"{IFREQ_SIZE}s", name.encode()[:15])
+                try:
+                    res = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)
+                except OSError:
+                    continue  # No IPv4 address
+                found[name] = socket.inet_ntoa(
+                    res[IFREQ_ADDR_OFFSET : IFREQ_ADDR_OFFSET + 4]
+                )
+        return found
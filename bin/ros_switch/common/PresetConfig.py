@@ -1,6 +1,6 @@
 from enum import IntEnum
 from typing import Dict, Generic, List, Any, TypeVar
-from dataclasses import field
+from dataclasses import field, fields
 
 from ..utils.data.YAMLObject import YAMLObject
 from ..utils.data.UseDefault import CustomClassField
@@ -11,6 +11,8 @@ T = TypeVar("T")
 
 
 class EnvVar(Generic[T], CustomClassField[T]):
+    __slots__ = ("env", "value")
+
     def __init__(self, env: str, value: T | None = None):
         self.env = env
         self.value = value
@@ -64,7 +66,8 @@ class ROSEnvironment:
 
     def get_env(self) -> Dict[str, Any]:
         out = {}
-        for _, val in self.__dict__.items():
+        for f in fields(self):
+            val = getattr(self, f.name)
             assert type(val) is EnvVar
             if val.value is not None:
                 out.update({val.env: val.value})
@@ -90,9 +93,21 @@ class CustomPaths:
     others: Dict[str, List[str]] = field(default_factory=dict)
 
 
+@YAMLObject(tag="generation")
+class GenerationOptions:
+    # Source the workspaces at generation time and export the result
+    freeze: bool = False
+    # Time the sections of the scripts and print a breakdown after loading
+    timed: bool = False
+    # Leave the missing workspaces and paths out of the loading script
+    prune: bool = False
+
+
 @YAMLObject(tag="preset")
 class PresetConfig:
     ros_version: ROSVersion
+    # Name of the parent profile, whose configuration this one extends
+    extends: str | None = None
 
     metadata: MetaData = field(default_factory=MetaData)
     term: TerminalConfig = field(default_factory=TerminalConfig)
@@ -108,6 +123,8 @@ class PresetConfig:
     pre_unload: List[str] = field(default_factory=list)
     post_unload: List[str] = field(default_factory=list)
 
+    generation: GenerationOptions = field(default_factory=GenerationOptions)
+
     def __post_init__(self) -> None:
         """
         Verification
@@ -1,23 +1,33 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Iterator, List, Tuple
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, Iterator, List, Tuple
+import hashlib
 import os
-import yaml
 import re
 
-from .generator.ScriptGenerator import ScriptGenerator
-from .PresetConfig import PresetConfig
+from .ConfigCache import ConfigCache
+from .PresetIndex import PresetIndex
+from .ScriptMeta import ScriptMeta, TransitionMeta
 from .ShellCom import Shell
 from .constants import (
+    CACHE_DIR,
+    LOCKS_DIR,
     PRESET_EXTENSION,
-    PRESET_DIR,
     PRESET_PATHS,
     UNLOAD_DIR,
     LOAD_DIR,
+    RUNTIME_DIR,
     SCRIPT_EXT,
+    TRANSITIONS_CACHE_DIR,
+    runtime_dir_ok,
 )
-from ..utils.file import read_file
-from ..utils.data.YAMLObject import YAMLProcessor
+from ..utils.file import file_lock, read_file
+from ..utils.timing import Timings
+
+# The YAML parsing and the generator are imported when needed only, so that
+# loading already generated scripts doesn't import them
+if TYPE_CHECKING:
+    from .PresetConfig import PresetConfig
 
 
 class PathType(Enum):
@@ -34,7 +44,16 @@ class PresetData:
     install_script: str | None = None
     uninstall_script: str | None = None
 
-    config: PresetConfig | None = None
+    config: "PresetConfig | None" = None
+    # Files the configuration is parsed from (the profile, then its parents)
+    sources: List[str] = field(default_factory=list)
+
+    # Configurations already parsed by this process, as
+    # {file: ({source: stamp}, config)}
+    _LOADED_CONFIGS: ClassVar[Dict] = {}
+    # Profiles trees already resolved by this process (merged with their
+    # parents), as {file: (tree, {source: (stamp, hash)})}
+    _RESOLVED_TREES: ClassVar[Dict] = {}
 
     def __post_init__(self):
         self.install_script = PresetData.preset_file2install_file(self.preset_file)
@@ -50,44 +69,128 @@ class PresetData:
             self.uninstall_script is not None and os.path.exists(self.uninstall_script)
         )
 
-    def get_config(self) -> PresetConfig | None:
+    def is_writable(self) -> bool:
+        """
+        Return True if the install / uninstall files can be (re-)generated by
+        the current user (e.g. not for the admin presets of other users)
+        """
+        return all(
+            script is not None
+            and os.access(os.path.dirname(script), os.W_OK)
+            and (not os.path.exists(script) or os.access(script, os.W_OK))
+            for script in (self.install_script, self.uninstall_script)
+        )
+
+    def is_fresh(self) -> bool:
+        """
+        Return True if the install / uninstall files have been generated from
+        the current version of the preset file and of the generator
+        """
+        if not self.is_generated():
+            return False
+        with Timings.phase("freshness check"):
+            load_meta = ScriptMeta.read(self.install_script)  # type: ignore
+            unload_meta = ScriptMeta.read(self.uninstall_script)  # type: ignore
+            return (
+                load_meta is not None
+                and load_meta == unload_meta
+                and load_meta.is_fresh()
+            )
+
+    def get_config(self) -> "PresetConfig | None":
         """
         Get the configuration associated with this preset, or None if an error happened
         """
         if self.config is None:
+            loaded = PresetData._LOADED_CONFIGS.get(self.preset_file)
+            if loaded is not None and all(
+                ConfigCache.stamp(src) == stamp for src, stamp in loaded[0].items()
+            ):
+                Shell.debug(f"Configuration {self.preset_file} already loaded")
+                self.config = loaded[1]
+                self.sources = list(loaded[0].keys())
+                return self.config
+
+            with Timings.phase("config cache"):
+                cached = ConfigCache.get(self.preset_file)
+            if cached is not None:
+                Shell.debug(f"Configuration {self.preset_file} loaded from the cache")
+                self.config, stamps = cached
+                self.sources = list(stamps.keys())
+                PresetData._LOADED_CONFIGS[self.preset_file] = (stamps, self.config)
+                return self.config
+
+            with Timings.phase("yaml imports"):
+                from ..utils.data.YAMLObject import YAMLSchema
+                from .PresetConfig import PresetConfig  # Registers the YAML tags
+
             Shell.start_section("Preset YAML Loading")
             try:
-                # Load file
+                # Parse the profile and the ones it extends, then build the
+                # objects from the merged tree
                 Shell.debug(f"Loading file {self.preset_file}")
-                data = read_file(self.preset_file)
-                if data is None:
-                    raise RuntimeError(
-                        f"Unable to load YAML data for preset {self.preset_name}"
-                    )
-
-                # Pre-processing YAML string
-                Shell.debug(YAMLProcessor.print_mappings())
-                data = YAMLProcessor.raw_2_tags(data)
-                Shell.debug(f"Output of YAMLProcessor:\n{data}")
-
-                # Parse YAML Configuration
-                config: dict | None = yaml.safe_load(data)
-                if config is None or "preset" not in config.keys():
-                    raise RuntimeError("The YAML file couldn't be parsed correctly ...")
+                tree, sources = PresetData._resolve_tree(self.preset_file, [])
+                with Timings.phase("objects building"):
+                    config: dict = YAMLSchema.build({"preset": tree})
                 self.config = config["preset"]
+                self.sources = list(sources.keys())
+                PresetData._LOADED_CONFIGS[self.preset_file] = (
+                    {src: stamp for src, (stamp, _) in sources.items()},
+                    self.config,  # type: ignore
+                )
+                with Timings.phase("config cache"):
+                    ConfigCache.put(self.preset_file, sources, self.config)  # type: ignore
                 Shell.txt("\t-> YAML loaded successfully")
                 Shell.debug(f"{self.config}")
             except RuntimeError as e:
                 raise RuntimeError(f"Error while loading configuration file: \n\t{e}")
         return self.config
 
-    def generate_files(self, ignore_warnings: bool = False) -> None:
+    def generate_files(
+        self,
+        ignore_warnings: bool = False,
+        force: bool = False,
+        options: Dict[str, Any] | None = None,
+    ) -> bool:
         """
-        Launch the generation of install and uninstall scripts.
+        Launch the generation of install and uninstall scripts, if they are
+        not up to date with the preset file (or if forced to). The generation
+        holds a per-preset lock, so that concurrent generations of a preset
+        (e.g. two shells loading it) wait for the first one instead of racing.
+
+        Args:
+            ignore_warnings (bool): don't warn when overwriting the scripts
+            force (bool): regenerate the scripts even if they are up to date
+            options (Dict[str, Any] | None): generation options overriding the
+                ones of the profile (e.g. `freeze`), kept for the next
+                regenerations
+
+        Returns:
+            bool: True if the scripts have been (re-)generated
         """
+        with file_lock(self._lock_path()):
+            return self._generate_files(ignore_warnings, force, options)
+
+    def _generate_files(
+        self, ignore_warnings: bool, force: bool, options: Dict[str, Any] | None
+    ) -> bool:
+        previous = (
+            ScriptMeta.read(self.install_script)  # type: ignore
+            if self.is_generated()
+            else None
+        )
+        merged_options = dict({} if previous is None else previous.options)
+        merged_options.update({} if options is None else options)
+        changed = previous is not None and previous.options != merged_options
+
+        if not force and not changed and self.is_fresh():
+            Shell.txt(f"\t-> Scripts for preset {self.preset_name} are up to date")
+            return False
         if not ignore_warnings and self.is_generated():
             Shell.warning(
                 f"Loading / Unloading script for preset {self.preset_name} already exists! Overwriting ..."
+                if force
+                else f"Loading / Unloading script for preset {self.preset_name} is outdated! Regenerating ..."
             )
 
         # Check if config not loaded, then load it
@@ -99,17 +202,89 @@ class PresetData:
                     f"Trying to generate config on unexisting config `{self.preset_name}`!"
                 )
 
+        # Fingerprint the profile and the profiles it extends, and stamp the
+        # directories the parents were looked up in
+        files, lookup_dirs = PresetData._split_sources(self.sources)
+        meta = ScriptMeta.from_sources(files)
+        meta.options = merged_options
+        for dpath in lookup_dirs:
+            try:
+                meta.stamps[dpath] = os.stat(dpath).st_mtime_ns
+            except OSError:
+                meta.stamps[dpath] = None
+
         # Test if destination path exists
         if self.install_script is None or self.uninstall_script is None:
             raise RuntimeError("Trying to generate files on None paths ...")
 
-        generator = ScriptGenerator(
-            self.config,
-            self.preset_name,
-            self.install_script,
-            self.uninstall_script,
+        from .generator.ScriptGenerator import ScriptGenerator
+
+        with Timings.phase("generation"):
+            generator = ScriptGenerator(
+                self.config,
+                self.preset_name,
+                self.install_script,
+                self.uninstall_script,
+                meta,
+            )
+            generator.generate_load_unload()
+        return True
+
+    def transition_script(self, target: "PresetData") -> str | None:
+        """
+        Get the script switching directly from this preset (loaded) to the
+        given one, only touching what differs between them. The transitions are
+        cached per pair of presets, and generated again when the scripts of one
+        of them changed.
+
+        Args:
+            target (PresetData): the preset to switch to
+
+        Returns:
+            str | None: the path to the transition script, or None if this
+                preset has to be unloaded first (see TransitionGenerator)
+        """
+        source_meta = ScriptMeta.read(self.install_script)  # type: ignore
+        target_meta = ScriptMeta.read(target.install_script)  # type: ignore
+        if source_meta is None or target_meta is None:
+            return None
+        key = TransitionMeta.compute_key(
+            source_meta, target_meta, [self.preset_name, target.preset_name]
         )
-        generator.generate_load_unload()
+        path = self._transition_path(target)
+        cached = TransitionMeta.read(path)
+        if cached is not None and cached.key == key:
+            return path if cached.possible else None
+
+        source_config, target_config = self.get_config(), target.get_config()
+        if source_config is None or target_config is None:
+            return None
+
+        from .generator.TransitionGenerator import TransitionGenerator
+
+        with Timings.phase("transition generation"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Built on demand while loading: the progress of the generator is
+            # not shown
+            stream = Shell.set_stream(None)
+            previous = Shell.flush()
+            generator = TransitionGenerator(
+                source_config,
+                source_meta,
+                self.preset_name,
+                target_config,
+                target_meta,
+                target.preset_name,
+                path,
+                key,
+            )
+            try:
+                possible = generator.generate()
+            finally:
+                Shell.flush()
+                Shell.forward(previous)
+                Shell.set_stream(stream)
+            return path if possible else None
 
     # =========================================================================
     # Preset lookup functions
@@ -125,13 +300,27 @@ class PresetData:
         Returns:
             Tuple[str, str] | None: a tuple of
         """
-        # Look for the several locations
-        profile = None
-        for path, is_admin in PresetData.path_iter():
-            profile = PresetData.__find_profile_in_dir(path, is_admin, profile_name)
-            if profile is not None:
-                break
-        return profile
+        entry = PresetIndex.get().find(profile_name)
+        if entry is None:
+            return None
+        return PresetData(entry.preset_name, entry.is_admin, entry.preset_file)
+
+    def dependents(self) -> "List[PresetData]":
+        """
+        Find the generated profiles extending this one (directly or not), from
+        the sources recorded in their scripts
+
+        Returns:
+            List[PresetData]: the profiles whose scripts depend on this profile
+        """
+        out = []
+        for preset in PresetData.list_preset_files().values():
+            if preset.preset_file == self.preset_file or not preset.is_generated():
+                continue
+            meta = ScriptMeta.read(preset.install_script)  # type: ignore
+            if meta is not None and self.preset_file in meta.sources[1:]:
+                out.append(preset)
+        return out
 
     @staticmethod
     def list_admin_configs() -> "Dict[str, PresetData]":
@@ -141,13 +330,7 @@ class PresetData:
         Returns:
             Dict[str, Tuple[str, str]]: a map (k,v) of {preset_name: (tag, preset_path)}
         """
-        founds = {}
-        for path, is_admin in PresetData.path_iter(PathType.ADMIN):
-            founds = dict(
-                founds,
-                **PresetData.__list_profiles_in_dir(path, is_admin, founds.keys()),  # type: ignore
-            )
-        return founds
+        return PresetData.__list_profiles(PathType.ADMIN)
 
     @staticmethod
     def list_user_configs() -> "Dict[str, PresetData]":
@@ -157,13 +340,7 @@ class PresetData:
         Returns:
             Dict[str, Tuple[str, str]]: a map (k,v) of {preset_name: (tag, preset_path)}
         """
-        founds = {}
-        for path, is_admin in PresetData.path_iter(PathType.USER):
-            founds = dict(
-                founds,
-                **PresetData.__list_profiles_in_dir(path, is_admin, founds.keys()),  # type: ignore
-            )
-        return founds
+        return PresetData.__list_profiles(PathType.USER)
 
     @staticmethod
     def list_preset_files() -> "Dict[str, PresetData]":
@@ -173,17 +350,36 @@ class PresetData:
         Returns:
             Dict[str, Tuple[str, str]]: a map (k,v) of {preset_name: (tag, preset_path)}
         """
-        founds = {}
-        for path, is_admin in PresetData.path_iter():
-            founds = dict(
-                founds,
-                **PresetData.__list_profiles_in_dir(path, is_admin, founds.keys()),  # type: ignore
-            )
-        return founds
+        return PresetData.__list_profiles()
 
     # =========================================================================
     # Helpers function
     # =========================================================================
+    def _lock_path(self) -> str:
+        """
+        Path to the lock file guarding the generation of this preset
+        """
+        locks_dir = os.path.join(RUNTIME_DIR, LOCKS_DIR)
+        if not runtime_dir_ok(create=True):
+            raise RuntimeError(
+                f"The runtime directory {RUNTIME_DIR} is not private to the current user, refusing to use it!"
+            )
+        os.makedirs(locks_dir, mode=0o700, exist_ok=True)
+        key = hashlib.sha1(os.path.abspath(self.preset_file).encode()).hexdigest()
+        return os.path.join(locks_dir, f"{key}.lock")
+
+    def _transition_path(self, target: "PresetData") -> str:
+        """
+        Path to the cached transition script from this preset to the given one
+        """
+        keys = [
+            hashlib.sha1(os.path.abspath(p.preset_file).encode()).hexdigest()
+            for p in (self, target)
+        ]
+        return os.path.join(
+            CACHE_DIR, TRANSITIONS_CACHE_DIR, f"{keys[0]}-{keys[1]}{SCRIPT_EXT}"
+        )
+
     @staticmethod
     def path_iter(mode: PathType = PathType.BOTH) -> Iterator[Tuple[str, bool]]:
         """
@@ -206,9 +402,92 @@ class PresetData:
             if test(t):
                 yield t
 
+    @staticmethod
+    def _split_sources(sources: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Split the sources of a configuration into the profiles files and the
+        directories looked into for its parents (recorded with a trailing
+        separator)
+        """
+        files = [src for src in sources if not src.endswith(os.sep)]
+        dirs = [src.rstrip(os.sep) for src in sources if src.endswith(os.sep)]
+        return files, dirs
+
+    @staticmethod
+    def _resolve_tree(
+        preset_file: str, chain: List[str]
+    ) -> Tuple[dict, Dict[str, Tuple[Tuple[int, int], str | None]]]:
+        """
+        Parse the `preset` mapping of a profile, merged over the one of the
+        profile it extends (recursively)
+
+        Args:
+            preset_file (str): the path to the profile file
+            chain (List[str]): the profiles files extended by this one, for the
+                cycles detection
+
+        Raises:
+            RuntimeError: if a profile can't be parsed, if a parent can't be
+                found or if the profiles extend each other
+
+        Returns:
+            Tuple[dict, Dict[str, Tuple[Tuple[int, int], str | None]]]: the
+                merged tree, and its sources as {file: (stamp, hash)}. The
+                directories looked into to find the parents are sources as well
+                (with a trailing separator and no hash, see `_split_sources`),
+                so that a profile shadowing a parent outdates the tree.
+        """
+        if preset_file in chain:
+            cycle = chain[chain.index(preset_file) :] + [preset_file]
+            raise RuntimeError(
+                "The profiles extend each other: "
+                + " -> ".join(PresetIndex.file2name(os.path.basename(f)) for f in cycle)
+            )
+        resolved = PresetData._RESOLVED_TREES.get(preset_file)
+        if resolved is not None and all(
+            ConfigCache.stamp(src) == stamp for src, (stamp, _) in resolved[1].items()
+        ):
+            return resolved
+
+        import yaml
+        from ..utils.data.YAMLObject import YAMLSchema, yaml_loader
+
+        stamp = ConfigCache.stamp(preset_file)
+        digest = ConfigCache.digest(preset_file)
+        with Timings.phase("profile read"):
+            data = read_file(preset_file)
+        if data is None:
+            raise RuntimeError(f"Unable to load YAML data of {preset_file}")
+        with Timings.phase("yaml parsing"):
+            tree = YAMLSchema.normalize(yaml.load(data, Loader=yaml_loader()))
+        if not isinstance(tree, dict) or not isinstance(tree.get("preset"), dict):
+            raise RuntimeError("The YAML file couldn't be parsed correctly ...")
+
+        preset: dict = tree["preset"]
+        sources = {preset_file: (stamp, digest)}
+        parent_name = preset.get("extends")
+        if parent_name is not None:
+            parent = PresetData.find_profile(str(parent_name))
+            if parent is None:
+                raise RuntimeError(
+                    f"The profile `{parent_name}` extended by {preset_file} couldn't be found"
+                )
+            Shell.debug(f"Extending the profile {parent.preset_file}")
+            for dpath in PresetIndex.get().lookup_dirs(parent.preset_file):
+                dpath = os.path.join(dpath, "")
+                sources[dpath] = (ConfigCache.stamp(dpath), None)
+            parent_tree, parent_sources = PresetData._resolve_tree(
+                parent.preset_file, chain + [preset_file]
+            )
+            preset = YAMLSchema.merge(parent_tree, preset)
+            sources.update(parent_sources)
+
+        PresetData._RESOLVED_TREES[preset_file] = (preset, sources)
+        return preset, sources
+
     @staticmethod
     def preset_file2preset_name(file_name: str) -> str:
-        return file_name.split(".")[0].replace("_", " ").title()
+        return PresetIndex.file2name(file_name)
 
     @staticmethod
     def preset_name2preset_file(preset_name: str) -> str:
@@ -263,90 +542,21 @@ class PresetData:
         p_split = input_path.split(os.path.sep)
         return re.sub(p_split[-2], new_dir, input_path)
 
-    # =========================================================================
-    # Directories walks function
-    # =========================================================================
     @staticmethod
-    def __find_profile_in_dir(
-        dirpath: str,
-        is_admin: bool,
-        preset_name: str,
-    ) -> "PresetData|None":
+    def __list_profiles(mode: PathType = PathType.BOTH) -> "Dict[str, PresetData]":
         """
-        Walk the dir to find the given ROS configuration file
+        List the indexed profiles of the given kind
 
         Args:
-            dirpath (str): the path to look into
-            is_admin (bool): whether or not the path is admin configs
-            profile_name (str): the profile name to look for
+            mode (PathType): the kind of paths to look into
 
         Returns:
-            PresetData | None: the data of the preset if it exists, None otherwise
+            Dict[str, PresetData]: a map (k,v) of {preset_name: preset_data}
         """
-        # Test for directory to exist
-        if not os.path.exists(dirpath):
-            return None
-
-        for dpath, _, filenames in os.walk(os.path.join(dirpath, PRESET_DIR)):
-            for f in filenames:
-                # Check if profile file
-                if not f.endswith(PRESET_EXTENSION):
-                    continue
-
-                # Compute simple name
-                found_preset = PresetData.preset_file2preset_name(f)
-
-                if (found_preset.lower() == preset_name.lower()) or (
-                    f.lower() == f"{preset_name.lower()}{PRESET_EXTENSION}"
-                ):
-                    return PresetData(
-                        found_preset,
-                        is_admin,
-                        os.path.join(dpath, f),
-                        "",
-                        "",
-                    )
-        return None
-
-    @staticmethod
-    def __list_profiles_in_dir(
-        dirpath: str,
-        is_admin: bool,
-        existing_names: List[str] = [],
-    ) -> "Dict[str, PresetData]":
-        """
-        Walk the dir to find the ROS profile configuration files.
-
-        Args:
-            dirpath (str): the path to look into for conf files
-
-        Returns:
-            Dict[str, "Tuple[str, str]"]: a map (k,v) of {preset_name: (tag, preset_path)}
-        """
-        # Test for directory to exist
-        if not os.path.exists(dirpath):
-            return {}
-
         out = {}
-        for dpath, _, filenames in os.walk(os.path.join(dirpath, PRESET_DIR)):
-            for f in filenames:
-                # Check if profile file
-                if not f.endswith(PRESET_EXTENSION):
-                    continue
-
-                # Compute simple name
-                found_preset = PresetData.preset_file2preset_name(f)
-
-                # Test if name already used
-                if found_preset in out.keys() or found_preset in existing_names:
-                    i = 1
-                    new_preset = f"{found_preset}_{i}"
-                    while new_preset in out.keys() or new_preset in existing_names:
-                        i += 1
-                        new_preset = f"{found_preset}_{i}"
-                    found_preset = new_preset
-
-                out[found_preset] = PresetData(
-                    found_preset, is_admin, os.path.join(dpath, f), "", ""
+        for entry in PresetIndex.get().entries():
+            if mode == PathType.BOTH or entry.is_admin == (mode == PathType.ADMIN):
+                out[entry.preset_name] = PresetData(
+                    entry.preset_name, entry.is_admin, entry.preset_file
                 )
         return out
@@ -0,0 +1,253 @@
+from dataclasses import dataclass
+from typing import Dict, List
+import json
+import os
+
+from .constants import (
+    CACHE_DIR,
+    INDEX_FILE,
+    PRESET_DIR,
+    PRESET_EXTENSION,
+    PRESET_PATHS,
+    VERSION,
+)
+from ..utils.timing import Timings
+
+
+@dataclass
+class IndexEntry:
+    preset_name: str
+    is_admin: bool
+    preset_file: str
+
+
+class PresetIndex:
+    """
+    Persistent name -> file index of the profiles found in the PRESET_PATHS.
+
+    The index is stored in the cache directory along with the modification
+    times of every directory of the walked `profiles/` trees. On load, only
+    the trees whose directories changed are walked again, and the resolution
+    of duplicated names (`_1`, `_2` suffixes) is only recomputed when a tree
+    changed. Looking up a profile is then a single dictionary access.
+    """
+
+    _INSTANCE: "PresetIndex | None" = None
+
+    def __init__(self) -> None:
+        self._trees: Dict[str, dict] = {}
+        self._entries: List[IndexEntry] = []
+        self._lookup: Dict[str, int] = {}
+        self._dirty = False
+
+    # =========================================================================
+    # Public API
+    # =========================================================================
+    @staticmethod
+    def get() -> "PresetIndex":
+        """
+        Get the index of this process, loading it from the disk and
+        validating it against the filesystem on the first call.
+
+        Returns:
+            PresetIndex: the up-to-date index
+        """
+        if PresetIndex._INSTANCE is None:
+            with Timings.phase("index load"):
+                PresetIndex._INSTANCE = PresetIndex._load()
+        with Timings.phase("index refresh"):
+            PresetIndex._INSTANCE.refresh()
+        return PresetIndex._INSTANCE
+
+    def find(self, preset_name: str) -> IndexEntry | None:
+        """
+        Look for a profile by its name (or by its file name without extension)
+
+        Args:
+            preset_name (str): the name of the profile
+
+        Returns:
+            IndexEntry | None: the entry of the profile if it exists, None otherwise
+        """
+        idx = self._lookup.get(preset_name.lower())
+        return None if idx is None else self._entries[idx]
+
+    def lookup_dirs(self, preset_file: str) -> List[str]:
+        """
+        The directories looked into to find the given profile by its name: the
+        ones of its tree and of the trees searched before it, as a profile
+        with the same name added in one of them would be found instead
+
+        Args:
+            preset_file (str): the path to the profile file
+
+        Returns:
+            List[str]: the directories, in the lookup order
+        """
+        dirs: List[str] = []
+        for tree in self._trees.values():
+            dirs += tree["dirs"].keys()
+            if preset_file in tree["files"]:
+                break
+        return dirs
+
+    def entries(self) -> List[IndexEntry]:
+        """
+        Return all the indexed profiles, in the PRESET_PATHS order
+        """
+        return self._entries
+
+    def refresh(self) -> None:
+        """
+        Validate the index against the directories modification times and
+        rescan the trees that changed.
+        """
+        trees = {}
+        for root, is_admin in PRESET_PATHS:
+            key = PresetIndex._tree_key(root, is_admin)
+            tree = self._trees.get(key)
+            if tree is None or not PresetIndex._is_valid(tree):
+                with Timings.phase("profiles walk"):
+                    tree = PresetIndex._scan(root)
+                self._dirty = True
+            trees[key] = tree
+
+        if list(trees.keys()) != list(self._trees.keys()):
+            self._dirty = True
+        self._trees = trees
+
+        if self._dirty:
+            self._resolve()
+            self._save()
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def file2name(file_name: str) -> str:
+        return file_name.split(".")[0].replace("_", " ").title()
+
+    @staticmethod
+    def _tree_key(root: str, is_admin: bool) -> str:
+        return f"{'admin' if is_admin else 'user'}:{root}"
+
+    @staticmethod
+    def _mtime(path: str) -> int | None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _is_valid(tree: dict) -> bool:
+        """
+        Return True if none of the directories of the tree changed since the
+        last scan.
+        """
+        for dpath, mtime in tree["dirs"].items():
+            if PresetIndex._mtime(dpath) != mtime:
+                return False
+        return True
+
+    @staticmethod
+    def _scan(root: str) -> dict:
+        """
+        Walk the profiles directory of the given root path
+
+        Args:
+            root (str): the path to look into for conf files
+
+        Returns:
+            dict: the scanned tree, as {dirs: {path: mtime}, files: [path]}
+        """
+        profiles_dir = os.path.join(root, PRESET_DIR)
+        tree = {"dirs": {profiles_dir: PresetIndex._mtime(profiles_dir)}, "files": []}
+        if tree["dirs"][profiles_dir] is None:
+            return tree
+
+        for dpath, _, filenames in os.walk(profiles_dir):
+            tree["dirs"][dpath] = PresetIndex._mtime(dpath)
+            for f in filenames:
+                if f.endswith(PRESET_EXTENSION):
+                    tree["files"].append(os.path.join(dpath, f))
+        return tree
+
+    def _resolve(self) -> None:
+        """
+        Compute the names of all the indexed profiles (suffixing the duplicated
+        ones) and the lookup table.
+        """
+        self._entries = []
+        used = set()
+        for key, tree in self._trees.items():
+            is_admin = key.startswith("admin:")
+            for f in tree["files"]:
+                found_preset = PresetIndex.file2name(os.path.basename(f))
+
+                # Test if name already used
+                if found_preset in used:
+                    i = 1
+                    while f"{found_preset}_{i}" in used:
+                        i += 1
+                    found_preset = f"{found_preset}_{i}"
+                used.add(found_preset)
+                self._entries.append(IndexEntry(found_preset, is_admin, f))
+
+        # Profile names and file names first, so that the first profile in the
+        # lookup order keeps its name, then the suffixed duplicates
+        self._lookup = {}
+        for idx, entry in enumerate(self._entries):
+            fname = os.path.basename(entry.preset_file).lower()
+            self._lookup.setdefault(PresetIndex.file2name(fname).lower(), idx)
+            self._lookup.setdefault(fname[: -len(PRESET_EXTENSION)], idx)
+        for idx, entry in enumerate(self._entries):
+            self._lookup.setdefault(entry.preset_name.lower(), idx)
+
+    # =========================================================================
+    # Persistence
+    # =========================================================================
+    @staticmethod
+    def _index_path() -> str:
+        return os.path.join(CACHE_DIR, INDEX_FILE)
+
+    @staticmethod
+    def _load() -> "PresetIndex":
+        index = PresetIndex()
+        try:
+            with open(PresetIndex._index_path(), "r") as f:
+                data = json.load(f)
+            if data.get("version") != VERSION:
+                return index
+            index._trees = data["trees"]
+            index._entries = [IndexEntry(*e) for e in data["entries"]]
+            index._lookup = data["lookup"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return PresetIndex()
+        return index
+
+    def _save(self) -> None:
+        """
+        Write the index in the cache directory. The index is only a cache, so
+        failing to write it is not an error.
+        """
+        self._dirty = False
+        path = PresetIndex._index_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "version": VERSION,
+                        "trees": self._trees,
+                        "entries": [
+                            [e.preset_name, e.is_admin, e.preset_file]
+                            for e in self._entries
+                        ],
+                        "lookup": self._lookup,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
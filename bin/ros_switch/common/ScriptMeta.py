@@ -0,0 +1,177 @@
+from dataclasses import dataclass, field, asdict, fields
+from typing import Any, Dict, List
+import hashlib
+import json
+import os
+
+from .constants import SCRIPTS_REVISION, VERSION
+
+META_TAG = "ros_switch-meta:"
+TRANSITION_TAG = "ros_switch-transition:"
+
+
+@dataclass
+class ScriptMeta:
+    """
+    Metadata embedded in the first line of the generated scripts.
+
+    The fingerprint is a hash of the generator version, of the scripts layout
+    revision and of the content of every source file the scripts were
+    generated from, so that the scripts can be checked for staleness without
+    parsing the profile. The stamps are the
+    modification times of external paths the scripts depend on (e.g. the
+    workspaces of a frozen profile), and the options the generation options
+    given on the command line, kept for the next regenerations. The resolve map
+    holds the variables whose value is an interface address to resolve at
+    loading, as {variable: interface pattern}. The layout map records the
+    existence of the workspaces setup files the scripts were generated for,
+    so that the scripts are outdated when the file to source changes. The
+    incomplete list holds the paths that couldn't be checked at generation
+    (e.g. a hung mount), the scripts being outdated until they can be.
+    """
+
+    fingerprint: str
+    sources: List[str] = field(default_factory=list)
+    stamps: Dict[str, int | None] = field(default_factory=dict)
+    options: Dict[str, Any] = field(default_factory=dict)
+    resolve: Dict[str, str | None] = field(default_factory=dict)
+    layout: Dict[str, bool] = field(default_factory=dict)
+    incomplete: List[str] = field(default_factory=list)
+
+    @staticmethod
+    def compute_fingerprint(sources: List[str]) -> str | None:
+        """
+        Compute the fingerprint of the given source files
+
+        Args:
+            sources (List[str]): the files the scripts are generated from
+
+        Returns:
+            str | None: the fingerprint, or None if a source can't be read
+        """
+        h = hashlib.sha256(f"{VERSION}-{SCRIPTS_REVISION}".encode())
+        for src in sources:
+            try:
+                with open(src, "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                return None
+            h.update(b"\0")
+        return h.hexdigest()
+
+    @staticmethod
+    def from_sources(sources: List[str]) -> "ScriptMeta":
+        fingerprint = ScriptMeta.compute_fingerprint(sources)
+        if fingerprint is None:
+            raise RuntimeError(f"Unable to read the sources {sources}")
+        return ScriptMeta(fingerprint, list(sources))
+
+    def is_fresh(self) -> bool:
+        """
+        Return True if none of the sources, stamped paths and workspaces
+        layouts changed since the generation, and every path could be checked
+        """
+        if len(self.incomplete) != 0:
+            return False
+        if self.fingerprint != ScriptMeta.compute_fingerprint(self.sources):
+            return False
+        for path, mtime in self.stamps.items():
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                return False
+        for path, exists in self.layout.items():
+            if os.path.isfile(path) != exists:
+                return False
+        return True
+
+    # =========================================================================
+    # Serialization
+    # =========================================================================
+    def to_line(self) -> str:
+        return f"{META_TAG} {json.dumps(asdict(self))}"
+
+    @staticmethod
+    def read(script: str) -> "ScriptMeta | None":
+        """
+        Read the metadata of a generated script
+
+        Args:
+            script (str): the path to the generated script
+
+        Returns:
+            ScriptMeta | None: the metadata, or None if the script has none
+        """
+        try:
+            with open(script, "r") as f:
+                line = f.readline()
+        except OSError:
+            return None
+
+        idx = line.find(META_TAG)
+        if idx < 0:
+            return None
+        try:
+            data = json.loads(line[idx + len(META_TAG) :])
+            known = {f.name for f in fields(ScriptMeta)}
+            return ScriptMeta(**{k: v for k, v in data.items() if k in known})
+        except (ValueError, TypeError):
+            return None
+
+
+@dataclass
+class TransitionMeta:
+    """
+    Metadata embedded in the first line of the transition scripts (switching
+    directly from a loaded profile to another one).
+
+    The key is a hash of the metadata of the scripts of both profiles, so that
+    the transition is outdated as soon as the scripts of one of them are
+    regenerated. A transition that is not possible is cached as well, as a
+    file holding this line only.
+    """
+
+    key: str
+    possible: bool = True
+
+    @staticmethod
+    def compute_key(source: ScriptMeta, target: ScriptMeta, names: List[str]) -> str:
+        h = hashlib.sha256(source.to_line().encode())
+        for part in [target.to_line()] + names:
+            h.update(b"\0")
+            h.update(part.encode())
+        return h.hexdigest()
+
+    # =========================================================================
+    # Serialization
+    # =========================================================================
+    def to_line(self) -> str:
+        return f"{TRANSITION_TAG} {json.dumps(asdict(self))}"
+
+    @staticmethod
+    def read(script: str) -> "TransitionMeta | None":
+        """
+        Read the metadata of a transition script
+
+        Args:
+            script (str): the path to the transition script
+
+        Returns:
+            TransitionMeta | None: the metadata, or None if the script has none
+        """
+        try:
+            with open(script, "r") as f:
+                line = f.readline()
+        except OSError:
+            return None
+
+        idx = line.find(TRANSITION_TAG)
+        if idx < 0:
+            return None
+        try:
+            data = json.loads(line[idx + len(TRANSITION_TAG) :])
+            return TransitionMeta(str(data["key"]), bool(data["possible"]))
+        except (ValueError, TypeError, KeyError):
+            return None
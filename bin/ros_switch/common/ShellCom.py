@@ -1,6 +1,10 @@
-from colorama import Fore
+from collections import deque
+from typing import Deque, TextIO
+
 from .constants import APP_NAME, AUTHOR, VERSION, YEAR
-from ..utils.string_title import StrSections
+
+# Maximum number of messages kept in memory when they are not streamed
+MAX_BUFFERED_MSGS = 10000
 
 
 class Shell:
@@ -11,11 +15,21 @@ class Shell:
         - txt: basic logging messages
         - error: error display
         - load: ask to source a file to load its content in the shell
+        - env: ask to export a variable in the shell
+
+    Each message is a record made of the key and the text, both terminated by
+    a NUL character, so that the shell wrapper reads them with `read -d ''`
+    without any decoding. When a stream is set (the standard output of the
+    rosswitch command), the messages are written and flushed as they are
+    emitted, so that the shell wrapper can act upon them while the command is
+    running. Otherwise (resident server, generation workers), they are kept in
+    a bounded buffer until flushed.
     """
 
-    buffer = ""
+    buffer: Deque[str] = deque(maxlen=MAX_BUFFERED_MSGS)
+    _STREAM: TextIO | None = None
+    _DROPPED = 0
     _IN_DEBUG = False
-    TAB_SIZE = 4
 
     @staticmethod
     def enable_debug_msgs(state: bool = True) -> None:
@@ -26,21 +40,53 @@ class Shell:
     # =========================================================================
 
     @staticmethod
-    def __format_msg(txt: str) -> str:
-        return (
-            txt.replace("".ljust(Shell.TAB_SIZE, " "), "\t")
-            .replace(" ", "%20")
-            .replace("\n", "%21")
-            .replace("\t", "%22")
-        )
+    def msg(lvl: str, msg: str) -> None:
+        Shell._emit(f"{lvl}\0{msg.replace(chr(0), '')}\0")
 
     @staticmethod
-    def msg(lvl: str, msg: str) -> None:
-        Shell.buffer += f" {lvl} {Shell.__format_msg(msg)}"
+    def _emit(record: str) -> None:
+        if Shell._STREAM is not None:
+            Shell._STREAM.write(record)
+            Shell._STREAM.flush()
+            return
+        if len(Shell.buffer) == Shell.buffer.maxlen:
+            Shell._DROPPED += 1
+        Shell.buffer.append(record)
+
+    @staticmethod
+    def set_stream(stream: TextIO | None) -> TextIO | None:
+        """
+        Set the stream the messages are written to (None to buffer them)
+
+        Returns:
+            TextIO | None: the previous stream
+        """
+        previous = Shell._STREAM
+        Shell._STREAM = stream
+        return previous
 
     @staticmethod
     def to_str() -> str:
-        return Shell.buffer
+        return "".join(Shell.buffer)
+
+    @staticmethod
+    def flush() -> str:
+        """
+        Empty the messages buffer and return its previous content, to forward
+        the messages emitted in another process
+        """
+        out = Shell.to_str()
+        if Shell._DROPPED != 0:
+            dropped, Shell._DROPPED = Shell._DROPPED, 0
+            out = f"txt\0({dropped} messages dropped)\0{out}"
+        Shell.buffer.clear()
+        return out
+
+    @staticmethod
+    def forward(buffer: str) -> None:
+        fields = buffer.split("\0")
+        for i in range(0, len(fields) - 1, 2):
+            Shell._emit(f"{fields[i]}\0{fields[i + 1]}\0")
 
     # =========================================================================
     # Shell communication functions
@@ -50,23 +96,36 @@ class Shell:
     def txt(msg: str) -> None:
         Shell.msg("txt", msg)
 
+    # colorama is only imported when a colored message is emitted, to keep it
+    # out of the imports of the load / unload fast path
+
     @staticmethod
     def debug(msg: str) -> None:
         if Shell._IN_DEBUG:
+            from colorama import Fore
+
             Shell.txt(f"{Fore.GREEN}[DEBUG] {msg}{Fore.RESET}")
 
     @staticmethod
     def error(msg: str) -> None:
+        from colorama import Fore
+
         Shell.txt(f"{Fore.RED}[ERROR] {msg}{Fore.RESET}")
 
     @staticmethod
     def warning(msg: str) -> None:
+        from colorama import Fore
+
         Shell.txt(f"{Fore.YELLOW}[WARN] {msg}{Fore.RESET}")
 
     @staticmethod
     def load(file: str) -> None:
         Shell.msg("load", file)
 
+    @staticmethod
+    def env(var: str, val: str) -> None:
+        Shell.msg("env", f"{var}={val}")
+
     # =========================================================================
     # High-level messages
     # =========================================================================
@@ -74,10 +133,13 @@ class Shell:
     HEADER_WIDTH = 80
     SHELL_FILLING = r"~"
     LINE_CHAR = r"-"
-    HIDDEN_COLOR = Fore.BLACK
+    HIDDEN_COLOR = "\x1b[30m"  # colorama.Fore.BLACK
 
     @staticmethod
     def start_section(section_title: str) -> None:
+        from colorama import Fore
+        from ..utils.string_title import StrSections
+
         Shell.txt(
             StrSections.make_underlined_section(
                 f"¤ {section_title}", line_color=Fore.CYAN
@@ -86,6 +148,9 @@ class Shell:
 
     @staticmethod
     def print_header() -> None:
+        from colorama import Fore
+        from ..utils.string_title import StrSections
+
         Shell.txt(
             StrSections.make_header(
                 [
@@ -0,0 +1,200 @@
+from dataclasses import dataclass
+from typing import Dict, List
+import os
+import subprocess
+import tempfile
+
+# Sub-directories of a workspace that may hold a setup file, by priority:
+# colcon or catkin install (merged or isolated), catkin devel space, then the
+# workspace being a plain prefix itself
+SETUP_SUBDIRS = ["install", "install_isolated", "devel", "devel_isolated", ""]
+SETUP_FILE = "local_setup.sh"
+
+# Environment kept when sourcing the workspaces in the sandboxed shell
+SANDBOX_ENV = ["HOME", "USER", "LOGNAME", "LANG", "TERM", "SHELL", "PATH", "TMPDIR"]
+SANDBOX_IGNORED = ["_", "PWD", "OLDPWD", "SHLVL"]
+SANDBOX_TIMEOUT = 300
+
+
+@dataclass
+class FrozenVar:
+    """
+    Value of an environment variable after the sourcing of the workspaces.
+
+    When the variable existed before the sourcing and its value is still part
+    of the new one, `prefix` and `suffix` hold what the workspaces added around
+    it, so that the loader can apply them on the current value of the shell.
+    """
+
+    name: str
+    value: str | None
+    prefix: str = ""
+    suffix: str = ""
+    spliced: bool = False
+
+    def is_path(self) -> bool:
+        return self.name.endswith("PATH")
+
+
+class Workspace:
+    """
+    Helpers around the ROS workspaces of a profile
+    """
+
+    @staticmethod
+    def expand(ws: str) -> str:
+        return os.path.expanduser(os.path.expandvars(ws))
+
+    @staticmethod
+    def setup_subdir(ws: str) -> str | None:
+        """
+        Find the layout of the given workspace: the sub-directory holding the
+        setup file to source
+
+        Args:
+            ws (str): the path to the workspace (environment variables are expanded)
+
+        Returns:
+            str | None: the sub-directory ("" for the workspace root), or None
+                if no setup file is found
+        """
+        root = Workspace.expand(ws)
+        for sub in SETUP_SUBDIRS:
+            if os.path.isfile(os.path.join(root, sub, SETUP_FILE)):
+                return sub
+        return None
+
+    @staticmethod
+    def setup_file(ws: str) -> str | None:
+        """
+        Return the setup file to source for the given workspace (see
+        `setup_subdir`), or None if there's none
+        """
+        sub = Workspace.setup_subdir(ws)
+        return (
+            None if sub is None else os.path.join(Workspace.expand(ws), sub, SETUP_FILE)
+        )
+
+    @staticmethod
+    def layout(ws: str) -> Dict[str, bool]:
+        """
+        Record the layout of the given workspace: the existence of the setup
+        files whose creation or removal changes the file to source (the found
+        one and the ones with a higher priority).
+
+        Args:
+            ws (str): the path to the workspace (environment variables are expanded)
+
+        Returns:
+            Dict[str, bool]: a map (k,v) of {setup file path: exists}
+        """
+        root = Workspace.expand(ws)
+        out = {}
+        for sub in SETUP_SUBDIRS:
+            path = os.path.join(root, sub, SETUP_FILE)
+            out[path] = os.path.isfile(path)
+            if out[path]:
+                break
+        return out
+
+    @staticmethod
+    def stamps(ws: str) -> Dict[str, int | None]:
+        """
+        Compute the modification times of the parts of a workspace that change
+        when it is built: the install / devel directories, their direct
+        children (a package added or removed) and the setup files.
+
+        Args:
+            ws (str): the path to the workspace
+
+        Returns:
+            Dict[str, int | None]: a map (k,v) of {path: mtime, None if missing}
+        """
+        root = Workspace.expand(ws)
+        out: Dict[str, int | None] = {}
+        for sub in SETUP_SUBDIRS:
+            sub_dir = os.path.join(root, sub)
+            if len(sub) != 0:
+                out[sub_dir] = Workspace._mtime(sub_dir)
+                if out[sub_dir] is None:
+                    continue
+                with os.scandir(sub_dir) as it:
+                    for entry in it:
+                        out[entry.path] = Workspace._mtime(entry.path)
+            setup = os.path.join(sub_dir, SETUP_FILE)
+            out[setup] = Workspace._mtime(setup)
+        return out
+
+    @staticmethod
+    def freeze(workspaces: List[str]) -> List[FrozenVar]:
+        """
+        Source the workspaces in a sandboxed bash (minimal environment, no
+        user rc files) and record the changes they made to the environment.
+
+        Args:
+            workspaces (List[str]): the workspaces to source, in order
+
+        Raises:
+            RuntimeError: if the sourcing failed
+
+        Returns:
+            List[FrozenVar]: the variables modified by the workspaces
+        """
+        before = {
+            k: v
+            for k, v in os.environ.items()
+            if k in SANDBOX_ENV or k.startswith("LC_")
+        }
+        setup_files = [Workspace.setup_file(ws) for ws in workspaces]
+        script = "".join(f'source "{f}"\n' for f in setup_files if f is not None)
+
+        with tempfile.NamedTemporaryFile() as env_file:
+            try:
+                proc = subprocess.run(
+                    [
+                        "bash",
+                        "--noprofile",
+                        "--norc",
+                        "-c",
+                        script + 'env -0 > "$1"',
+                        "bash",
+                        env_file.name,
+                    ],
+                    env=before,
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    text=True,
+                    timeout=SANDBOX_TIMEOUT,
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                raise RuntimeError(f"Unable to source the workspaces: {e}")
+            if proc.returncode != 0:
+                raise RuntimeError(
+                    f"Sourcing the workspaces failed:\n{proc.stderr.strip()}"
+                )
+            raw = env_file.read().decode()
+
+        after = dict(e.split("=", 1) for e in raw.split("\0") if "=" in e)
+        delta = []
+        for name in sorted(before.keys() | after.keys()):
+            old, new = before.get(name), after.get(name)
+            if name in SANDBOX_IGNORED or old == new:
+                continue
+            if old is None or new is None or len(old) == 0 or old not in new:
+                delta.append(FrozenVar(name, new))
+            else:
+                idx = new.index(old)
+                delta.append(
+                    FrozenVar(name, new, new[:idx], new[idx + len(old) :], True)
+                )
+        return delta
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def _mtime(path: str) -> int | None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
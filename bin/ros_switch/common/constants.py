@@ -1,7 +1,6 @@
 from enum import Enum
 import os
-import platform
-import ctypes
+import sys
 from typing import List, Tuple
 
 # -----------------------------------------------------------------------------
@@ -11,14 +10,37 @@ APP_NAME = "ros_switch"
 AUTHOR = "Meltwin"
 VERSION = "v1.0.0-alpha3"
 YEAR = "2024"
+# Revision of the generated scripts layout, to bump when the generator output
+# changes so that the existing scripts are regenerated
+SCRIPTS_REVISION = 9
+# Revision of the profiles classes, to bump when their layout changes so that
+# the cached configurations are parsed again
+CONFIGS_REVISION = 4
 
 ENV_RSWITCH_PRE = "RSWCH_"
 ENV_CUSTOM_ADMIN_PATH = ENV_RSWITCH_PRE + "CUSTOM_ADMIN_PATHS"
 ENV_CUSTOM_PATH = ENV_RSWITCH_PRE + "CUSTOM_PATHS"
+ENV_PRESET_NAME = ENV_RSWITCH_PRE + "PRESET_NAME"
+ENV_SHELL_PID = ENV_RSWITCH_PRE + "SHELL_PID"
+ENV_CALLER_DIR = ENV_RSWITCH_PRE + "CALLER_DIR"
+ENV_RESOLVED_PRE = "_" + ENV_RSWITCH_PRE + "RESOLVED_"
+ENV_TRACE = ENV_RSWITCH_PRE + "TRACE"
+ENV_TRACE_PROFILE = ENV_RSWITCH_PRE + "TRACE_PROFILE"
 PRESET_DIR = "profiles"
 LOAD_DIR = "loader"
 UNLOAD_DIR = "unloader"
 PRESET_EXTENSION = ".rosprofile"
+INDEX_FILE = "index.json"
+CONFIGS_CACHE_DIR = "configs"
+TRANSITIONS_CACHE_DIR = "transitions"
+LOCKS_DIR = "locks"
+DAEMON_SOCKET = "daemon.sock"
+DAEMON_PID_FILE = "daemon.pid"
+WATCH_PID_FILE = "watch.pid"
+WATCH_PENDING_FILE = "watch.pending"
+SNAPSHOT_FILE = "env.{pid}.{stage}"
+RESTORE_FILE = "restore.{pid}.sh"
+INTERFACES_FILE = "interfaces.json"
 
 
 # -----------------------------------------------------------------------------
@@ -30,8 +52,10 @@ class OSType(Enum):
     MACOS = 2
 
 
-match platform.system().lower():
-    case "windows":
+match sys.platform:
+    case "win32":
+        import ctypes
+
         OS_TYPE = OSType.WINDOWS
         IS_ADMIN = ctypes.windll.shell32.IsUserAnAdmin() != 0  # type: ignore
         # TODO: Set admin path for configuration
@@ -40,6 +64,8 @@ match platform.system().lower():
             CONF_DIR = ADMIN_CONF_DIR
         else:
             CONF_DIR = os.path.expandvars(os.path.join("%APPDATA%", APP_NAME))
+        CACHE_DIR = os.path.expandvars(os.path.join("%LOCALAPPDATA%", APP_NAME))
+        RUNTIME_DIR = os.path.expandvars(os.path.join("%TEMP%", APP_NAME))
         SCRIPT_EXT = ".bat"
 
     case "linux":
@@ -47,6 +73,16 @@ match platform.system().lower():
         IS_ADMIN = os.getuid() == 0
         ADMIN_CONF_DIR = os.path.join("/opt", "ros", APP_NAME)
         CONF_DIR = os.path.join(os.path.expanduser("~"), ".local", "share", APP_NAME)
+        CACHE_DIR = os.path.join(
+            os.environ.get(
+                "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+            ),
+            APP_NAME,
+        )
+        RUNTIME_DIR = os.path.join(
+            os.environ.get("XDG_RUNTIME_DIR", f"/tmp/{APP_NAME}-{os.getuid()}"),
+            APP_NAME,
+        )
         SCRIPT_EXT = ".sh"
     case "darwin":
         OS_TYPE = OSType.MACOS
@@ -62,11 +98,28 @@ match platform.system().lower():
                 "Preferences",
                 APP_NAME,
             )
+        CACHE_DIR = os.path.join(os.path.expanduser("~"), "Library", "Caches", APP_NAME)
+        RUNTIME_DIR = os.path.join(
+            os.environ.get("XDG_RUNTIME_DIR", f"/tmp/{APP_NAME}-{os.getuid()}"),
+            APP_NAME,
+        )
         SCRIPT_EXT = ".sh"
 
+# Without XDG_RUNTIME_DIR, the runtime directory is made in a directory of the
+# shared /tmp, which must also be checked
+RUNTIME_PARENT = (
+    None
+    if OS_TYPE == OSType.WINDOWS or "XDG_RUNTIME_DIR" in os.environ
+    else os.path.dirname(RUNTIME_DIR)
+)
 
 INSTALL_DIR = os.path.realpath(os.path.join(__file__, "..", "..", "..", ".."))
 
+# Shell library holding the functions the generated scripts call, and the
+# version of it they need (see the library header)
+RUNTIME_LIB = os.path.join(INSTALL_DIR, "bin", ".rosswitch_runtime.sh")
+RUNTIME_LIB_VERSION = 4
+
 
 # Preset paths
 def setup_paths() -> List[Tuple[str, bool]]:
@@ -89,4 +142,24 @@ def setup_paths() -> List[Tuple[str, bool]]:
     return paths
 
 
+
+def runtime_dir_ok(create: bool = False) -> bool:
+    """
+    Check that the runtime directory (holding the daemon socket, the watcher
+    markers and the environment snapshots) is private to the current user, as
+    another user could otherwise plant files in it.
+
+    Args:
+        create (bool): create the directory if needed
+
+    Returns:
+        bool: True if the runtime directory can be used
+    """
+    from ..utils.file import is_private_dir, make_private_dir
+
+    check = make_private_dir if create else is_private_dir
+    dirs = [RUNTIME_DIR] if RUNTIME_PARENT is None else [RUNTIME_PARENT, RUNTIME_DIR]
+    return all(check(d) for d in dirs)
+
+
 PRESET_PATHS = setup_paths()
@@ -1,24 +1,34 @@
 from enum import Enum
-from typing import List
+from functools import partial
+from typing import Any, Dict, List, Set
+import os
 
 from .ScriptWriter import ScriptWriter, WriterConfig
-from .ShellWriter import ShellScriptWriter
+from .ShellWriter import ShellScriptWriter, is_ip
 
-from ..PresetConfig import PresetConfig, ROSEnvironment, ROSVersion
+from ..PresetConfig import PresetConfig, ROSVersion
+from ..ScriptMeta import ScriptMeta
 from ..ShellCom import Shell
+from ..Workspace import FrozenVar, Workspace
 from ..constants import (
+    ENV_PRESET_NAME,
     ENV_RSWITCH_PRE,
     OS_TYPE,
     OSType,
     OS_TYPE,
 )
 from ...utils.file import mk_file_dir
+from ...utils.threads import run_concurrently
+from ...utils.timing import Timings
 
 
 class Messages:
     PRE_LOAD_CMDS = "Pre-Load commands"
     ENV_VARIABLES = "Environment vars"
+    ENV_SNAPSHOT = "Environment snapshot"
+    ENV_RESTORE = "Environment restoration"
     WORKSPACES_SOURCE = "Workspaces sourcing"
+    WORKSPACES_FROZEN = "Frozen workspaces environment"
     WORKSPACES_CLEAN = "Workspaces cleaning"
     POST_LOAD_CMDS = "Post-Load commands"
     PRE_UNLOAD_CMDS = "Pre-Unload commands"
@@ -26,11 +36,13 @@ class Messages:
     ROS_ENVIRONMENT = "ROS environment"
     DEPENDENCIES = "Dependencies"
     PATHS = "Custom paths"
+    WORKSPACE = "Workspace"
+    PATH = "Path"
 
 
 class Vars:
     # Preset
-    PRESET_NAME = f"{ENV_RSWITCH_PRE}PRESET_NAME"
+    PRESET_NAME = ENV_PRESET_NAME
     PRESET_FNAME = f"{ENV_RSWITCH_PRE}FPRESET_NAME"
     PRESET_COLOR = f"{ENV_RSWITCH_PRE}PRESET_COLOR"
     PRESET_SUFFIX = f"{ENV_RSWITCH_PRE}SUFFIX"
@@ -71,6 +83,8 @@ class ScriptGenerator:
 
     LOG_STEP_WIDTH = 50
     FILE_SECTION_WIDTH = 80
+    # Time given to the checks of the workspaces and paths, in seconds
+    CHECK_TIMEOUT = 2.0
 
     def __init__(
         self,
@@ -78,55 +92,155 @@ class ScriptGenerator:
         preset_name: str,
         load_path: str,
         unload_path: str,
+        meta: ScriptMeta,
     ):
         self._config = config
         self._preset_name = preset_name
         self._load_path = load_path
         self._unload_path = unload_path
+        self._meta = meta
+        self._frozen: List[FrozenVar] | None = None
+        # Sub-directory holding the setup file of each workspace
+        self._setup_subdirs: Dict[str, str | None] = {}
+        # Workspaces and paths that didn't answer in time / left out
+        self._unreachable: Set[str] = set()
+        self._pruned: Set[str] = set()
 
     def generate_load_unload(self) -> None:
-        self._generate_load_script()
-        self._generate_unload_script()
+        self._meta.resolve.update(self._interface_lookups())
+        with Timings.phase("paths checks"):
+            self._check_paths()
+        if self._meta.options.get("freeze", self._config.generation.freeze):
+            with Timings.phase("workspaces freezing"):
+                self._freeze_workspaces()
+        with Timings.phase("loading script"):
+            self._generate_load_script()
+        with Timings.phase("unloading script"):
+            self._generate_unload_script()
+
+    def _check_paths(self) -> None:
+        """
+        Check the workspaces and the custom paths concurrently, so that a slow
+        or hung mount doesn't stall the generation. The setup file of each
+        workspace is found once, so that the loading script sources it
+        directly, and the layouts are recorded so that the scripts are outdated
+        when a setup file appears or disappears. The missing workspaces and
+        paths are reported, and left out of the loading script with the
+        `prune` option (until they appear).
+        """
+        Shell.start_section("Paths checks")
+        tasks = {}
+        for wkspace in self._config.workspaces:
+            tasks[(Messages.WORKSPACE, wkspace)] = lambda ws=wkspace: (
+                Workspace.setup_subdir(ws),
+                Workspace.layout(ws),
+            )
+        for path in self._custom_paths():
+            # Paths depending on the environment of the loading shell are skipped
+            expanded = Workspace.expand(path)
+            if "$" not in expanded:
+                tasks[(Messages.PATH, path)] = partial(os.path.isdir, expanded)
+        results = run_concurrently(tasks, ScriptGenerator.CHECK_TIMEOUT)
+
+        prune = self._meta.options.get("prune", self._config.generation.prune)
+        for key in tasks.keys():
+            kind, path = key
+            if key not in results:
+                Shell.warning(
+                    f"{kind} {path} didn't answer in {ScriptGenerator.CHECK_TIMEOUT:g}s (slow or hung mount?)"
+                )
+                self._unreachable.add(path)
+                self._meta.incomplete.append(path)
+                continue
+            if isinstance(results[key], Exception):
+                Shell.error(f"{kind} {path} couldn't be checked: {results[key]}")
+                self._unreachable.add(path)
+                self._meta.incomplete.append(path)
+                continue
+
+            if kind == Messages.WORKSPACE:
+                self._setup_subdirs[path], layout = results[key]
+                self._meta.layout.update(layout)
+                if self._setup_subdirs[path] is not None:
+                    continue
+                Shell.warning(
+                    f"Workspace {path} does not seems to be a ROS workspace. No local_setup.sh found!"
+                )
+            elif results[key]:
+                continue
+            else:
+                Shell.warning(f"Path {path} does not exist!")
+                self._meta.stamps[Workspace.expand(path)] = None
+            if prune:
+                Shell.txt(f"\t-> {path} left out of the loading script")
+                self._pruned.add(path)
+
+    def _freeze_workspaces(self) -> None:
+        """
+        Source the workspaces once, so that the loading script only exports
+        the resulting environment. The workspaces build directories are
+        stamped, so that the scripts are outdated after a build.
+        """
+        Shell.start_section("Workspaces freezing")
+        workspaces = [
+            ws for ws in self._config.workspaces if ws not in self._unreachable
+        ]
+        for wkspace in workspaces:
+            self._meta.stamps.update(Workspace.stamps(wkspace))
+        self._frozen = Workspace.freeze(workspaces)
+        Shell.debug(f"Frozen environment: {self._frozen}")
 
     def _generate_load_script(self) -> None:
         Shell.start_section("Loading script generation")
         Shell.debug(
             f"Loading script directory for preset: {mk_file_dir(self._load_path)}"
         )
-        with self._get_writer(self._load_path) as ldscript:
+        with self._get_writer(self._load_path, self._is_timed()) as ldscript:
+            ldscript.write_meta(self._meta.to_line())
             ldscript.make_header(
                 self._preset_name,
                 self._config.metadata.author,
                 self._config.metadata.date,
                 self._config.metadata.description,
             )
+            ldscript.import_runtime()
+            ldscript.begin_timings()
             self._load_dependencies(ldscript)
+            self._snapshot_env(ldscript, "pre")
             self._pre_load_commands(ldscript)
             self._set_app_env_vars(ldscript)
             self._set_custom_env_vars(ldscript)
             self._set_custom_paths(ldscript)
             self._set_ros_env(ldscript)
             self._post_load_commands(ldscript)
+            self._snapshot_env(ldscript, "post")
+            ldscript.end_timings(f"Loading of {self._preset_name}")
 
     def _generate_unload_script(self) -> None:
         Shell.start_section("Unloading script generation")
         Shell.debug(
             f"Unload script directory for preset: {mk_file_dir(self._unload_path)}"
         )
-        with self._get_writer(self._unload_path) as uldscript:
+        with self._get_writer(self._unload_path, self._is_timed()) as uldscript:
+            uldscript.write_meta(self._meta.to_line())
             uldscript.make_header(
                 self._preset_name,
                 self._config.metadata.author,
                 self._config.metadata.date,
                 self._config.metadata.description,
             )
+            uldscript.import_runtime()
+            uldscript.begin_timings()
             self._unload_dependencies(uldscript)
             self._pre_unload_commands(uldscript)
+            self._restore_env_begin(uldscript)
             self._unload_env_vars(uldscript)
             self._remove_custom_paths(uldscript)
             self._unload_ros_env(uldscript)
             self._clear_path(uldscript)
+            self._restore_env_end(uldscript)
             self._post_unload_commands(uldscript)
+            uldscript.end_timings(f"Unloading of {self._preset_name}")
 
     # -------------------------------------------------------------------------
     # Loading script steps
@@ -139,10 +253,15 @@ class ScriptGenerator:
             self._config.workspaces,
         )
 
+    def _snapshot_env(self, writer: ScriptWriter, stage: str) -> None:
+        writer.log_step(f"{Messages.ENV_SNAPSHOT} ({stage}-load)")
+        writer._write_env_snapshot(stage)
+
     def _pre_load_commands(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.PRE_LOAD_CMDS, len(self._config.pre_load))
         for cmd in self._config.pre_load:
-            writer._write_cmd(cmd)
+            with writer.timed_step("command", cmd):
+                writer._write_cmd(cmd)
 
     def _set_app_env_vars(self, writer: ScriptWriter) -> None:
         writer.log_step(
@@ -163,48 +282,45 @@ class ScriptGenerator:
 
     def _set_custom_paths(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.PATHS)
-
-        def process_path(path: str | Paths, pathes: List[str]):
-            pname = path if type(path) is str else path.value  # type: ignore
-
-            for p in pathes:
-                writer.add_to_path(pname, p)
-
-        process_path(Paths.LIBRARIES, self._config.paths.library)
-        process_path(Paths.PYTHON, self._config.paths.python)
-        process_path(Paths.CMAKE, self._config.paths.cmake)
-        process_path(Paths.GLOBAL, self._config.paths.path)
-
-        # Custom paths
-        for pname, paths in self._config.paths.others.items():
-            process_path(pname.upper(), paths)
+        for pname, paths in ScriptGenerator.path_entries(self._config).items():
+            paths = [p for p in paths if p not in self._pruned]
+            if len(paths) != 0:
+                writer.add_to_path(pname, paths)
 
     def _set_ros_env(self, writer: ScriptWriter) -> None:
         # ROS environement variables
         writer.log_step(Messages.ROS_ENVIRONMENT)
 
-        # ROS IP special case
-        if self._config.ros_version == ROSVersion.ROS_1:
-            writer.export_ros_ip(
-                self._config.ros.ros_ip.env, self._config.ros.ros_ip.value
-            )
-
-        for env, val in self._config.ros.get_env().items():
-            if env == ROSEnvironment.ros_ip.env:
-                if self._config.ros_version == ROSVersion.ROS_1:
-                    continue
+        for env, val in ScriptGenerator.ros_vars(self._config).items():
+            if env == self._config.ros.ros_ip.env:
                 writer.export_ros_ip(env, val)
-            writer.export_var(env, val)
+            else:
+                writer.export_var(env, val)
 
         # ROS workspaces
-        writer.log_step(Messages.WORKSPACES_SOURCE, len(self._config.workspaces))
-        for wkspace in self._config.workspaces:
-            writer._write_load_workspace(wkspace)
+        if self._frozen is not None:
+            writer.log_step(Messages.WORKSPACES_FROZEN, len(self._frozen))
+            writer._write_frozen_env(self._frozen)
+        else:
+            workspaces = [
+                ws for ws in self._config.workspaces if ws not in self._pruned
+            ]
+            writer.log_step(Messages.WORKSPACES_SOURCE, len(workspaces))
+            for wkspace in workspaces:
+                with writer.timed_step("source", wkspace):
+                    writer._write_load_workspace(
+                        wkspace, self._setup_subdirs.get(wkspace)
+                    )
+
+        # The workspaces may add entries already in the paths (e.g. when
+        # loading over a sourced workspace)
+        writer.dedup_paths(ScriptGenerator.path_vars(self._config, self._frozen))
 
     def _post_load_commands(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.POST_LOAD_CMDS, len(self._config.post_load))
         for cmd in self._config.post_load:
-            writer._write_cmd(cmd)
+            with writer.timed_step("command", cmd):
+                writer._write_cmd(cmd)
 
     # -------------------------------------------------------------------------
     # Unloading script steps
@@ -218,7 +334,17 @@ class ScriptGenerator:
     def _pre_unload_commands(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.PRE_UNLOAD_CMDS, len(self._config.pre_unload))
         for cmd in self._config.pre_unload:
-            writer._write_cmd(cmd)
+            with writer.timed_step("command", cmd):
+                writer._write_cmd(cmd)
+
+    def _restore_env_begin(self, writer: ScriptWriter) -> None:
+        # Restore the snapshot of the environment taken when loading, or clean
+        # the environment from the profile description if there's none
+        writer.log_step(Messages.ENV_RESTORE)
+        writer._write_restore_begin()
+
+    def _restore_env_end(self, writer: ScriptWriter) -> None:
+        writer._write_restore_end()
 
     def _unload_env_vars(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.ENV_VARIABLES, len(self._config.env_var.keys()))
@@ -227,23 +353,16 @@ class ScriptGenerator:
 
     def _remove_custom_paths(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.PATHS)
-
-        def process_path(path: str | Paths, pathes: List[str]):
-            pname = path if type(path) is str else path.value  # type: ignore
-            for p in pathes:
-                writer.remove_from_path(pname, p)
-
-        process_path(Paths.LIBRARIES, self._config.paths.library)
-        process_path(Paths.PYTHON, self._config.paths.python)
-        process_path(Paths.CMAKE, self._config.paths.cmake)
-        process_path(Paths.GLOBAL, self._config.paths.path)
-        for pname, plist in self._config.paths.others.items():
-            process_path(pname.upper(), plist)
+        for pname, paths in ScriptGenerator.path_entries(self._config).items():
+            if len(paths) != 0:
+                writer.remove_from_path(pname, paths)
 
     def _unload_ros_env(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.ROS_ENVIRONMENT)
         for env_var in Vars.get_vars_list():
-            writer.unset_var(env_var)
+            # The workspaces list is needed to clean the paths
+            if env_var != Vars.WORKSPACE_VAR:
+                writer.unset_var(env_var)
         for env, _ in self._config.ros.get_env().items():
             writer.unset_var(env)
 
@@ -251,23 +370,126 @@ class ScriptGenerator:
         writer.log_step(Messages.WORKSPACES_CLEAN)
         for p in Paths.__members__.values():
             writer._write_clean_path(p.value, Vars.WORKSPACE_VAR)
+        writer.unset_var(Vars.WORKSPACE_VAR)
 
     def _post_unload_commands(self, writer: ScriptWriter) -> None:
         writer.log_step(Messages.POST_UNLOAD_CMDS, len(self._config.post_unload))
         for cmd in self._config.post_unload:
-            writer._write_cmd(cmd)
+            with writer.timed_step("command", cmd):
+                writer._write_cmd(cmd)
+
+    # -------------------------------------------------------------------------
+    # Generation helpers
+    # -------------------------------------------------------------------------
+    def _custom_paths(self) -> List[str]:
+        """
+        All the paths of the `paths` section of the profile
+        """
+        out = []
+        for paths in ScriptGenerator.path_entries(self._config).values():
+            out += paths
+        return out
+
+    def _is_timed(self) -> bool:
+        return self._meta.options.get("timed", self._config.generation.timed)
+
+    def _interface_lookups(self) -> Dict[str, str | None]:
+        """
+        Variables to set to the address of a network interface when loading
+
+        Returns:
+            Dict[str, str | None]: a map (k,v) of {variable: interface pattern}
+        """
+        ros_ip = self._config.ros.ros_ip
+        if ros_ip.value is not None and is_ip(ros_ip.value):
+            return {}
+        if self._config.ros_version == ROSVersion.ROS_1 or ros_ip.value is not None:
+            return {ros_ip.env: ros_ip.value}
+        return {}
 
     # -------------------------------------------------------------------------
     # Static method
     # -------------------------------------------------------------------------
 
+    @staticmethod
+    def path_entries(config: PresetConfig) -> Dict[str, List[str]]:
+        """
+        The entries of the `paths` section of a profile, by path variable
+
+        Args:
+            config (PresetConfig): the profile configuration
+
+        Returns:
+            Dict[str, List[str]]: a map (k,v) of {path variable: entries}
+        """
+        out: Dict[str, List[str]] = {
+            Paths.LIBRARIES.value: list(config.paths.library),
+            Paths.PYTHON.value: list(config.paths.python),
+            Paths.CMAKE.value: list(config.paths.cmake),
+            Paths.GLOBAL.value: list(config.paths.path),
+        }
+        for pname, paths in config.paths.others.items():
+            out[pname.upper()] = out.get(pname.upper(), []) + list(paths)
+        # Without duplicated or empty entries, in order
+        return {
+            pname: list(dict.fromkeys(p for p in paths if len(p) != 0))
+            for pname, paths in out.items()
+        }
+
+    @staticmethod
+    def path_vars(
+        config: PresetConfig, frozen: List[FrozenVar] | None = None
+    ) -> List[str]:
+        """
+        The path variables a profile changes: the ones of its `paths` section,
+        the ones set by the ROS workspaces and the frozen ones
+
+        Args:
+            config (PresetConfig): the profile configuration
+            frozen (List[FrozenVar] | None): the frozen environment, if any
+
+        Returns:
+            List[str]: the names of the path variables
+        """
+        out = list(ScriptGenerator.path_entries(config).keys())
+        out += [
+            Vars.AMENT_PREFIX_PATH,
+            Vars.COLCON_PREFIX_PATH,
+            Vars.PKG_CONFIG_PATH,
+            Vars.ROS_PACKAGE_PATH,
+        ]
+        if frozen is not None:
+            out += [var.name for var in frozen if var.is_path()]
+        return list(dict.fromkeys(out))
+
+    @staticmethod
+    def ros_vars(config: PresetConfig) -> Dict[str, Any]:
+        """
+        The ROS variables set by a profile. ROS_IP is always set for ROS 1, its
+        value being None when the address of the default interface is to be
+        looked for.
+
+        Args:
+            config (PresetConfig): the profile configuration
+
+        Returns:
+            Dict[str, Any]: a map (k,v) of {variable: value}
+        """
+        out: Dict[str, Any] = {}
+        if config.ros_version == ROSVersion.ROS_1:
+            out[config.ros.ros_ip.env] = config.ros.ros_ip.value
+        out.update(config.ros.get_env())
+        return out
+
     @staticmethod
     def _get_writer(
         file_name: str,
+        timed: bool = False,
     ) -> ScriptWriter:
         config = WriterConfig(
             ScriptGenerator.LOG_STEP_WIDTH,
             ScriptGenerator.FILE_SECTION_WIDTH,
+            timed=timed,
         )
         match OS_TYPE:
             case OSType.LINUX | OSType.MACOS:
@@ -1,19 +1,24 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Any
-from datetime import datetime
+from typing import Iterator, List, Any
+from io import StringIO
 from textwrap import wrap
 
 from ..PresetConfig import PresetConfig
+from ..Workspace import FrozenVar
 from ...utils.string_title import StrSections, Justify
 from ..constants import (
     ENV_RSWITCH_PRE,
     APP_NAME,
     AUTHOR,
+    RUNTIME_LIB,
+    RUNTIME_LIB_VERSION,
     VERSION,
     YEAR,
 )
 from ..ShellCom import Shell
+from ...utils.file import write_if_changed
 
 
 @dataclass
@@ -26,6 +31,9 @@ class WriterConfig:
     comment_prefix: str = "#"
     eol: str = "\n"
 
+    # Timed sections
+    timed: bool = False
+
     def update_from(self, d: dict) -> "WriterConfig":
         for key, val in d.items():
             if key in self.__dict__.keys():
@@ -43,10 +51,14 @@ class ScriptWriter(ABC):
     # --------------------------------------------------------
 
     def __enter__(self) -> "ScriptWriter":
-        self._file = open(self._filename, "w+")
+        # The script is rendered in memory, and only replaces the existing one
+        # once complete (and if it changed)
+        self._file = StringIO()
         return self
 
     def __exit__(self, type, value, traceback) -> None:
+        if type is None:
+            write_if_changed(self._filename, self._file.getvalue())
         self._file.close()
 
     def _write_line(self, txt: str) -> None:
@@ -74,18 +86,44 @@ class ScriptWriter(ABC):
     @abstractmethod
     def unset_var(self, var: str) -> None: ...
     @abstractmethod
-    def _write_load_workspace(self, ws: str) -> None: ...
+    def _write_load_workspace(self, ws: str, setup_subdir: str | None) -> None: ...
+    @abstractmethod
+    def _write_frozen_env(self, frozen: List[FrozenVar]) -> None: ...
+    @abstractmethod
+    def _write_env_snapshot(self, stage: str) -> None: ...
+    @abstractmethod
+    def _write_restore_begin(self) -> None: ...
+    @abstractmethod
+    def _write_restore_end(self) -> None: ...
     @abstractmethod
-    def add_to_path(self, path_env: str, path: str) -> None: ...
+    def add_to_path(self, path_env: str, paths: List[str]) -> None: ...
     @abstractmethod
-    def remove_from_path(self, path_env: str, path: str) -> None: ...
+    def remove_from_path(self, path_env: str, paths: List[str]) -> None: ...
+    @abstractmethod
+    def dedup_paths(self, path_envs: List[str]) -> None: ...
     @abstractmethod
     def _write_workspace_list(self, var: str, l: List[str]) -> None: ...
     @abstractmethod
     def _write_clean_path(self, path, ws) -> None: ...
+    @abstractmethod
+    def _write_runtime_import(self, path: str, version: int) -> None: ...
     def _custom_load_dep(self, config: PresetConfig) -> None: ...
     def _custom_unload_dep(self, config: PresetConfig) -> None: ...
 
+    # --------------------------------------------------------
+    # Timed sections functions
+    # --------------------------------------------------------
+    @abstractmethod
+    def _write_timings_begin(self) -> None: ...
+    @abstractmethod
+    def _write_section_start(self, label: str) -> None: ...
+    @abstractmethod
+    def _write_step_start(self) -> None: ...
+    @abstractmethod
+    def _write_step_end(self, kind: str, label: str) -> None: ...
+    @abstractmethod
+    def _write_timings_report(self, title: str) -> None: ...
+
     # --------------------------------------------------------
     # High Level export
     # --------------------------------------------------------
@@ -99,6 +137,40 @@ class ScriptWriter(ABC):
 
     def export_ros_ip(self, env, ip) -> None: ...
 
+    def import_runtime(self) -> None:
+        """
+        Make the functions of the runtime library available to the script
+        (sourced once per shell)
+        """
+        self._write_runtime_import(RUNTIME_LIB, RUNTIME_LIB_VERSION)
+
+    def begin_timings(self) -> None:
+        """
+        Start the clock of the script, if the sections are timed
+        """
+        if self._config.timed:
+            self._write_timings_begin()
+
+    @contextmanager
+    def timed_step(self, kind: str, label: str) -> Iterator[None]:
+        """
+        Time the commands written in the context (e.g. a workspace sourcing),
+        if the sections are timed
+        """
+        if self._config.timed:
+            self._write_step_start()
+        yield
+        if self._config.timed:
+            self._write_step_end(kind, label)
+
+    def end_timings(self, title: str) -> None:
+        """
+        Close the last section and print the ranked timings, if the sections
+        are timed
+        """
+        if self._config.timed:
+            self._write_timings_report(title)
+
     # --------------------------------------------------------
     # Writer utils
     # --------------------------------------------------------
@@ -119,6 +191,11 @@ class ScriptWriter(ABC):
                 width=self._config.log_file_width,
             )
         )
+        if self._config.timed:
+            self._write_section_start(txt)
+
+    def write_meta(self, meta_line: str) -> None:
+        self._write_comment(meta_line)
 
     def make_header(
         self,
@@ -134,7 +211,6 @@ class ScriptWriter(ABC):
                     f"(c) {AUTHOR} - {YEAR}",
                     "",
                     f'Preset "{preset_name}" by {author} - {date}',
-                    f"(compiled {datetime.today().strftime('%d/%m/%Y - %d %b %Y')})",
                     "",
                     Justify.LEFT,
                     *wrap(desc, width=self._config.log_file_width - 4),
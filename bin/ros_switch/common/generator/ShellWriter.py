@@ -1,8 +1,9 @@
 from typing import Any, List
+import os
 
-from ..PresetConfig import PresetConfig, ROSVersion
+from ..Workspace import SETUP_FILE, FrozenVar
 from .ScriptWriter import ScriptWriter, WriterConfig
-from colorama import Fore
+from ..constants import ENV_RESOLVED_PRE
 
 
 def is_ip(t: str) -> bool:
@@ -44,29 +45,70 @@ class ShellScriptWriter(ScriptWriter):
     def unset_var(self, var: str) -> None:
         self._write_line(f"unset {var}")
 
-    def _write_load_workspace(self, ws: str) -> None:
+    def _write_load_workspace(self, ws: str, setup_subdir: str | None) -> None:
+        # The workspace is only probed if its layout changed since the
+        # generation (the scripts are then regenerated at the next loading)
+        if setup_subdir is None:
+            self._write_line(f"_rswch_source_ws {self._format(ws)}")
+            return
+        setup = self._format(os.path.join(ws, setup_subdir, SETUP_FILE))
         self._write_line(
-            f"""
-wk_found=0
-for sub in $subs
-do
-    install_path="{ws}${{sub}}local_setup.sh"
-    if [[ -f $install_path ]]; then
-        source $install_path
-        wk_found=1
-    fi
-done
-if [[ $wk_found == 0 ]]; then
-    echo -e "{Fore.YELLOW}Workspace {ws} does not seems to be a ROS workspace. No local_setup.sh found!{Fore.RESET}"
-fi
-    """
+            f"""if [[ -f {setup} ]]; then
+    source {setup}
+else
+    _rswch_source_ws {self._format(ws)}
+fi"""
+        )
+
+    def _write_frozen_env(self, frozen: List[FrozenVar]) -> None:
+        def quote(s: str) -> str:
+            for c in ("\\", '"', "$", "`"):
+                s = s.replace(c, f"\\{c}")
+            return s
+
+        for var in frozen:
+            if var.value is None:
+                self.unset_var(var.name)
+            elif var.spliced:
+                self._write_line(
+                    f'export {var.name}="{quote(var.prefix)}${{{var.name}}}{quote(var.suffix)}"'
+                )
+            elif var.is_path():
+                self._write_line(
+                    f'export {var.name}="{quote(var.value)}${{{var.name}:+:${var.name}}}"'
+                )
+            else:
+                self._write_line(f'export {var.name}="{quote(var.value)}"')
+
+    def _write_env_snapshot(self, stage: str) -> None:
+        # The runtime directory is set by the rosswitch command
+        self._write_line(
+            f"""if [[ -n "$rswch_runtime_dir" ]]; then
+    env -0 > "$rswch_runtime_dir/env.$$.{stage}" 2> /dev/null
+fi"""
         )
 
-    def add_to_path(self, path_env: str, path) -> None:
-        self.export_var(path_env, f"${path_env}:{path}")
+    def _write_restore_begin(self) -> None:
+        self._write_line(
+            """if [[ -n "$rswch_runtime_dir" && -f "$rswch_runtime_dir/restore.$$.sh" ]]; then
+    source "$rswch_runtime_dir/restore.$$.sh"
+else"""
+        )
 
-    def remove_from_path(self, path_env: str, path: str) -> None:
-        self.export_var(path_env, f"$(_remove_paths ${path_env} {path})")
+    def _write_restore_end(self) -> None:
+        self._write_line("fi")
+
+    def add_to_path(self, path_env: str, paths: List[str]) -> None:
+        # The entries already in the variable are skipped
+        entries = " ".join(self._format(p) for p in paths)
+        self._write_line(f"_rswch_path_add {path_env} {entries}")
+
+    def remove_from_path(self, path_env: str, paths: List[str]) -> None:
+        entries = " ".join(self._format(p) for p in paths)
+        self._write_line(f"_rswch_path_remove {path_env} {entries}")
+
+    def dedup_paths(self, path_envs: List[str]) -> None:
+        self._write_line(f"_rswch_path_dedup {' '.join(path_envs)}")
 
     def _write_workspace_list(self, var: str, l: List[str]) -> None:
         self._write_line(f"{var}=(")
@@ -75,123 +117,55 @@ fi
         self._write_line(f")")
 
     def _write_clean_path(self, path, ws) -> None:
-        self.remove_from_path(path, f"${ws}")
+        self._write_line(f'_rswch_path_remove {path} "${{{ws}[@]}}"')
 
     def export_ros_ip(self, env, ip: str | None) -> None:
         if ip is not None and is_ip(ip):
             self.export_var(env, ip)
         else:
+            # Address resolved by rosswitch, or looked for by the script
+            resolved = f"{ENV_RESOLVED_PRE}{env}"
             self._write_line(
-                f"export {env}=$(_get_interface_ip {'' if ip is None else ip})"
+                f"""if [[ -n "${resolved}" ]]; then
+    export {env}="${resolved}"
+else
+    _rswch_interface_ip {'' if ip is None else self._format(ip)}
+    export {env}="$_rswch_ip"
+    unset _rswch_ip
+fi
+unset {resolved}"""
             )
 
     # --------------------------------------------------------
-    # Shell functions to use in the program
+    # Timed sections functions
     # --------------------------------------------------------
 
-    def _custom_load_dep(self, config: PresetConfig) -> None:
-        self._write_line('subs=("/" "/install/" "/devel/")')
+    @staticmethod
+    def _quote(val: str) -> str:
+        return "'" + val.replace("'", "'\\''") + "'"
 
-        # Look for interface lookup for ROS_IP
-        if config.ros_version == ROSVersion.ROS_1 or (
-            config.ros.ros_ip.value is not None and not is_ip(config.ros.ros_ip.value)
-        ):
-            self._write_line(
-                r"""
-# Function that generate a (name, ip) map of the interfaces of this computer
-# Exported as a list of name@ip 
-function _get_interfaces() {
-    local ips=$(ifconfig)
-    local interface_regex="[a-zA-Z0-9]+:$"
-    local ip_regex="[0-9.]+"
-    
-    if [[ $SHELL_TYPE == "zsh" ]]; then
-        ips="$(tr '\n' ' ' <<< $ips)"
-        read -r -A ips <<< $ips
-    fi
-
-    # Iterate over the words to get interfaces names and ip
-    local out=("")
-    local found_interface=""
-    local in_interface=0
-    local inet_found=0
-    for l in $ips; do
-        # echo $l
-        # Check for interface name
-        if [[ $l =~ $interface_regex ]]; then
-            found_interface=$(echo $l | rev | cut -c2- | rev)
-            in_interface=1
-        elif [[ $in_interface == 1 ]] && [[ $l = *"inet"* ]]; then
-            inet_found=1
-        elif [[ $inet_found == 1 ]] && [[ $l =~ $ip_regex ]]; then
-            # Save interface 
-            out="$out $found_interface@$l"
-            in_interface=0
-            inet_found=0
-        fi    
-    done
-    echo $out
-}
-
-# Function that return the ip of the given interface name
-# It checks for similar expression as the given argument
-# If no argument is provided, default to localhost
-function _get_interface_ip() {
-    local interfaces=$(_get_interfaces)
-    
-    if [[ $SHELL_TYPE == "bash" ]]; then
-        IFS=' ' read -ra interfaces <<< "$interfaces"
-    else
-        IFS=' ' read -rA interfaces <<< "$interfaces"
-    fi
-
-    local to_find
-    if [[ -z $1 ]]; then
-        to_find="lo"
-    else
-        to_find=$1
-    fi
-
-    for intf in $interfaces; do
-        local intf_name=$(echo $intf | cut -d "@" -f 1)
-        local intf_ip=$(echo $intf | cut -d "@" -f 2)
-        if [[ $intf_name =~ $to_find ]]; then
-            echo $intf_ip
-            break
-        fi
-    done
-}
-"""
-            )
+    def _write_timings_begin(self) -> None:
+        self._write_line("_rswch_timings_begin")
+
+    def _write_section_start(self, label: str) -> None:
+        self._write_line(f"_rswch_section_start {self._quote(label)}")
+
+    def _write_step_start(self) -> None:
+        self._write_line("_rswch_step_start")
+
+    def _write_step_end(self, kind: str, label: str) -> None:
+        self._write_line(f"_rswch_step_end {kind} {self._quote(label)}")
+
+    def _write_timings_report(self, title: str) -> None:
+        self._write_line(f"\n_rswch_timings_report {self._quote(title)}")
+
+    # --------------------------------------------------------
+    # Shell functions to use in the program
+    # --------------------------------------------------------
 
-    def _custom_unload_dep(self, config: PresetConfig) -> None:
+    def _write_runtime_import(self, path: str, version: int) -> None:
         self._write_line(
-            """
-# Function that remove ROS workspaces from a path (eg PATH, PYTHONPATH, ...)
-# Made by O. Kermorgan (https://github.com/oKermorgant/) for the ros_management_tools project
-function _remove_paths()
-{
-    if [[ $SHELL_TYPE == "bash" ]]; then
-        IFS=':' read -ra PATHES <<< "$1"
-    else
-        IFS=':' read -rA PATHES <<< "$1"
-    fi
-    local THISPATH=""
-    local ARGS=("$@")
-    local N_ARGS="${#ARGS[@]}"
-    for fpath in "${PATHES[@]}"; do
-        local to_remove=0
-        local i=0
-        for (( i=2; i <= $N_ARGS; i++ )); do
-            if [[ $fpath = *"${ARGS[$i]}"* ]]; then
-                to_remove=1
-            break
-            fi
-        done
-        if [ $to_remove -eq 0 ]; then
-            THISPATH="$THISPATH:$fpath"
-        fi
-    done
-    echo $THISPATH | cut -c2-
-}"""
+            f"""if [[ "${{_RSWCH_RUNTIME:-0}}" -lt {version} ]]; then
+    source {self._quote(path)}
+fi"""
         )
@@ -0,0 +1,198 @@
+from typing import Dict, List
+
+from .ScriptGenerator import Messages, ScriptGenerator, Vars
+from .ScriptWriter import ScriptWriter
+from .ShellWriter import is_ip
+
+from ..PresetConfig import PresetConfig
+from ..ScriptMeta import ScriptMeta, TransitionMeta
+from ..ShellCom import Shell
+from ..Workspace import Workspace
+from ...utils.file import write_if_changed
+
+
+class TransitionGenerator:
+    """
+    This class generate the shell script switching directly from a loaded
+    profile to another one, without unloading the first one.
+
+    The transition only touches what differs between the two profiles: the
+    variables of the first profile only are restored, the ones whose value
+    changes are exported, the path entries are swapped and the workspaces the
+    second profile adds are sourced. As a sourced workspace can't be taken
+    back, the transition is only possible when the workspaces of the second
+    profile extend the ones of the first profile (and are the same ones for
+    frozen profiles), and when both profiles share their pre / post commands
+    (which are then not run again).
+    """
+
+    def __init__(
+        self,
+        source: PresetConfig,
+        source_meta: ScriptMeta,
+        source_name: str,
+        target: PresetConfig,
+        target_meta: ScriptMeta,
+        target_name: str,
+        path: str,
+        key: str,
+    ):
+        self._source = source
+        self._source_meta = source_meta
+        self._source_name = source_name
+        self._target = target
+        self._target_meta = target_meta
+        self._target_name = target_name
+        self._path = path
+        self._key = key
+
+    def is_possible(self) -> bool:
+        """
+        Return True if the environment of the first profile can be turned into
+        the one of the second profile without unloading it
+        """
+        source, target = self._source, self._target
+        if source.ros_version != target.ros_version:
+            return False
+        for cmds in ("pre_load", "post_load", "pre_unload", "post_unload"):
+            if getattr(source, cmds) != getattr(target, cmds):
+                return False
+
+        frozen = self._is_frozen(source, self._source_meta)
+        if frozen != self._is_frozen(target, self._target_meta):
+            return False
+        if frozen:
+            return source.workspaces == target.workspaces
+        return target.workspaces[: len(source.workspaces)] == source.workspaces
+
+    def generate(self) -> bool:
+        """
+        Write the transition script, or only its metadata if the transition is
+        not possible (so that it is not looked for again)
+
+        Returns:
+            bool: True if the transition is possible
+        """
+        possible = self.is_possible()
+        Shell.debug(
+            f"Transition from {self._source_name} to {self._target_name} possible: {possible}"
+        )
+        if not possible:
+            write_if_changed(
+                self._path, f"# {TransitionMeta(self._key, False).to_line()}\n"
+            )
+            return False
+
+        writer = ScriptGenerator._get_writer(self._path, self._is_timed())
+        with writer as trscript:
+            trscript.write_meta(TransitionMeta(self._key).to_line())
+            trscript.make_header(
+                f"{self._source_name} -> {self._target_name}",
+                self._target.metadata.author,
+                self._target.metadata.date,
+                self._target.metadata.description,
+            )
+            trscript.import_runtime()
+            trscript.begin_timings()
+            trscript.log_step(Messages.DEPENDENCIES)
+            trscript._write_workspace_list(Vars.WORKSPACE_VAR, self._target.workspaces)
+            self._switch_env_vars(trscript)
+            self._switch_paths(trscript)
+            self._switch_ros_env(trscript)
+            trscript.log_step(f"{Messages.ENV_SNAPSHOT} (post-load)")
+            trscript._write_env_snapshot("post")
+            trscript.end_timings(
+                f"Switch from {self._source_name} to {self._target_name}"
+            )
+        return True
+
+    # -------------------------------------------------------------------------
+    # Transition steps
+    # -------------------------------------------------------------------------
+    def _switch_env_vars(self, writer: ScriptWriter) -> None:
+        old, new = self._source.env_var, self._target.env_var
+        writer.log_step(Messages.ENV_VARIABLES, len(new.keys()))
+        writer.export_var(Vars.PRESET_NAME, self._target_name)
+        writer.export_var(Vars.PRESET_FNAME, f" {self._target_name} ")
+        writer.export_var(Vars.PRESET_COLOR, self._target.term.preset_color.term_color)
+        writer.export_var(
+            Vars.PRESET_SUFFIX,
+            self._target.term.preset_color.BASH_SUFFIX,
+        )
+
+        # The variables of both profiles keep the value saved by the first one
+        for env in old.keys():
+            if env not in new:
+                writer._make_unload_env_var(env)
+        for env, val in new.items():
+            if env not in old:
+                writer._mk_load_env(env, val)
+            elif old[env] != val:
+                writer.export_var(env, val)
+
+    def _switch_paths(self, writer: ScriptWriter) -> None:
+        writer.log_step(Messages.PATHS)
+        old = self._path_entries(self._source, self._source_meta)
+        new = self._path_entries(self._target, self._target_meta)
+        for pname in old.keys() | new.keys():
+            removed = [p for p in old.get(pname, []) if p not in new.get(pname, [])]
+            added = [p for p in new.get(pname, []) if p not in old.get(pname, [])]
+            if len(removed) != 0:
+                writer.remove_from_path(pname, removed)
+            if len(added) != 0:
+                writer.add_to_path(pname, added)
+
+    def _switch_ros_env(self, writer: ScriptWriter) -> None:
+        writer.log_step(Messages.ROS_ENVIRONMENT)
+        old = ScriptGenerator.ros_vars(self._source)
+        new = ScriptGenerator.ros_vars(self._target)
+        ros_ip = self._target.ros.ros_ip.env
+        for env in old.keys():
+            if env not in new:
+                writer.unset_var(env)
+        for env, val in new.items():
+            if env == ros_ip and (val is None or not is_ip(val)):
+                # Interface address, resolved again
+                writer.export_ros_ip(env, val)
+            elif env not in old or old[env] != val:
+                writer.export_var(env, val)
+
+        # Workspaces added by the second profile
+        workspaces = self._target.workspaces[len(self._source.workspaces) :]
+        prune = self._target_meta.options.get("prune", self._target.generation.prune)
+        writer.log_step(Messages.WORKSPACES_SOURCE, len(workspaces))
+        for wkspace in workspaces:
+            setup_subdir = Workspace.setup_subdir(wkspace)
+            if setup_subdir is None and prune:
+                continue
+            with writer.timed_step("source", wkspace):
+                writer._write_load_workspace(wkspace, setup_subdir)
+        if len(workspaces) != 0:
+            writer.dedup_paths(ScriptGenerator.path_vars(self._target))
+
+    # -------------------------------------------------------------------------
+    # Generation helpers
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _path_entries(config: PresetConfig, meta: ScriptMeta) -> Dict[str, List[str]]:
+        """
+        The entries of the `paths` section set by the loading script of a
+        profile: with the `prune` option, the paths found missing at its
+        generation (stamped as such) are left out
+        """
+        entries = ScriptGenerator.path_entries(config)
+        if not meta.options.get("prune", config.generation.prune):
+            return entries
+        return {
+            pname: [
+                p for p in paths if meta.stamps.get(Workspace.expand(p), 0) is not None
+            ]
+            for pname, paths in entries.items()
+        }
+
+    def _is_timed(self) -> bool:
+        return self._target_meta.options.get("timed", self._target.generation.timed)
+
+    @staticmethod
+    def _is_frozen(config: PresetConfig, meta: ScriptMeta) -> bool:
+        return meta.options.get("freeze", config.generation.freeze)
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from argparse import _SubParsersAction, ArgumentParser
-from typing import Dict, Any, Literal
+from typing import TYPE_CHECKING, Dict, Any, Literal
+
+if TYPE_CHECKING:
+    from argparse import _SubParsersAction
 
 
 @dataclass
@@ -50,7 +52,7 @@ def ArgumentGroup(name: str, help: str | None = None):
         # Parent class configuration
         # -------------------------------------------------
         @staticmethod
-        def setup_parser(sp: _SubParsersAction):
+        def setup_parser(sp: "_SubParsersAction"):
             parser = sp.add_parser(_name, help=_help)
 
         setattr(cls, "setup_parser", setup_parser)
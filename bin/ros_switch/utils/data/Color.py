@@ -45,6 +45,7 @@ class ColorValue(Enum):
 
 
 class Color:
+    __slots__ = ("_color", "term_color")
 
     BASH_SUFFIX = Fore.RESET + Back.RESET + Style.RESET_ALL
 
@@ -1,10 +1,37 @@
-from typing import TypeVar, Callable
+from typing import Any, Callable, Dict, List, TypeVar
 
 from .UseDefault import dataclass_use_default
-from .YAMLProcessor import YAMLProcessor
+from .YAMLSchema import YAMLSchema
 
 T = TypeVar("T")
 
+# Constructors of the explicit tags (e.g. `!ros`), registered on the YAML
+# loaders once one is needed, so that the profiles classes can be used without
+# importing yaml
+_CONSTRUCTORS: Dict[str, Callable] = {}
+_LOADERS: List[Any] = []
+
+
+def yaml_loader() -> Any:
+    """
+    Get the YAML loader class to parse the profiles with: the libyaml-backed
+    CSafeLoader when available, else the pure-Python SafeLoader. The tags
+    constructors are registered on both.
+
+    Returns:
+        the loader class, to give to `yaml.load`
+    """
+    if len(_LOADERS) == 0:
+        import yaml
+
+        _LOADERS.append(yaml.SafeLoader)
+        if getattr(yaml, "__with_libyaml__", False):
+            _LOADERS.insert(0, yaml.CSafeLoader)
+        for tag, constructor in _CONSTRUCTORS.items():
+            for loader in _LOADERS:
+                loader.add_constructor(tag, constructor)
+    return _LOADERS[0]
+
 
 def YAMLObject(
     _cls: T | None = None,  # type: ignore
@@ -14,19 +41,21 @@ def YAMLObject(
     auto_implement: bool = True,
 ):
     """
-    Decorator that take care of all YAML Tag automatic parsing.
+    Decorator that take care of all YAML Tag automatic parsing. The objects are
+    built by the YAMLSchema from the parsed documents: at the root of a
+    document from the mapping of their key, and in another object from the
+    mapping of the fields annotated with their class.
 
     Args:
         _cls (_type_, optional): the class that represent the data structure of the tag
-        tag (str, optional): the tag name (e.g. if the tag is "foo", then it will automatically parse !foo blocks in the file)
-        str_corresp (str, optional): the string to look in the YAML string when the YAMLPreprocessor will run to include tags (else will consider it the same as the tag argument)
-        auto_implement (bool, optional): should the decorator implement an automatic parsing function (that simply redirect all values into the class constructor)
+        tag (str, optional): the tag name (e.g. if the tag is "foo", then it will also parse explicit !foo blocks in the file)
+        str_corresp (str, optional): the key of the class mapping at the root of a document (else will consider it the same as the tag argument)
+        auto_implement (bool, optional): should the decorator implement an automatic parsing function for the explicit tags (that simply redirect all values into the class constructor)
 
     Raises:
         UnImplementedMethod: if auto_implement is False and the class doesn't have a written static yaml_constructor method,
                             then raise an error since it won't be possible to load the YAML Tag.
     """
-    from yaml import SafeLoader
 
     def decorator(cls: T) -> T:
         if auto_implement:
@@ -42,10 +71,12 @@ def YAMLObject(
 
         real_tag = tag if tag is not None else str(cls)
         real_key = str_corresp if str_corresp is not None else real_tag
-        SafeLoader.add_constructor(f"!{real_tag}", cls.yaml_constructor)  # type: ignore
+        _CONSTRUCTORS[f"!{real_tag}"] = cls.yaml_constructor  # type: ignore
+        for loader in _LOADERS:
+            loader.add_constructor(f"!{real_tag}", cls.yaml_constructor)  # type: ignore
 
-        # Register tag
-        YAMLProcessor.register_tag(real_key, real_tag)
+        # Register the class in the schema
+        YAMLSchema.register(real_key, cls)  # type: ignore
 
         return cls
 
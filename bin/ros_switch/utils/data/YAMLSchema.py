@@ -0,0 +1,179 @@
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict
+
+
+class YAMLSchema:
+    """
+    Build the YAML objects from the mapping tree of a parsed document. The
+    schema of each class (which of its fields are YAML objects themselves) is
+    derived once from its dataclass annotations, so that the document is parsed
+    in a single pass without tagging it first.
+    """
+
+    ROOTS: Dict[str, type] = {}  # Key (at the root of a document) -> class
+    _SCHEMAS: Dict[type, Dict[str, type]] = {}  # Class -> {field: class}
+
+    @staticmethod
+    def register(key: str, cls: type) -> None:
+        if key not in YAMLSchema.ROOTS.keys():
+            YAMLSchema.ROOTS[key] = cls
+        YAMLSchema._SCHEMAS.pop(cls, None)
+
+    @staticmethod
+    def schema(cls: type) -> Dict[str, type]:
+        """
+        Get the fields of a class that are YAML objects
+
+        Args:
+            cls (type): a YAML object class
+
+        Returns:
+            Dict[str, type]: a map (k,v) of {field name: YAML object class}
+        """
+        schema = YAMLSchema._SCHEMAS.get(cls)
+        if schema is None:
+            known = set(YAMLSchema.ROOTS.values())
+            schema = {
+                f.name: f.type  # type: ignore
+                for f in (fields(cls) if is_dataclass(cls) else [])
+                if f.type in known
+            }
+            YAMLSchema._SCHEMAS[cls] = schema
+        return schema
+
+    @staticmethod
+    def normalize(tree: Any) -> Any:
+        """
+        Rename the sections keys of a parsed document to their registered
+        name, as they are matched case-insensitively (e.g. `ROS:` for `ros:`),
+        so that the documents can be merged before being built
+
+        Args:
+            tree (Any): the parsed document
+
+        Returns:
+            Any: the document with the sections keys renamed (the given tree
+                is not modified)
+        """
+
+        def rename(sections: Dict[str, type], value: Any) -> Any:
+            if not isinstance(value, dict):
+                return value
+            out = {}
+            for key, val in value.items():
+                key = YAMLSchema._section_key(sections, key)
+                sub_cls = sections.get(key)
+                out[key] = (
+                    val if sub_cls is None else rename(YAMLSchema.schema(sub_cls), val)
+                )
+            return out
+
+        return rename(YAMLSchema.ROOTS, tree)
+
+    @staticmethod
+    def merge(base: Any, override: Any) -> Any:
+        """
+        Merge two parsed mapping trees (e.g. a parent profile and its child):
+        the mappings are merged recursively, the lists of the override are
+        appended to the ones of the base (without duplicates), and the other
+        values of the override replace the ones of the base. A null value in
+        the override keeps the base one.
+
+        Args:
+            base (Any): the base tree
+            override (Any): the tree overriding the base one
+
+        Returns:
+            Any: the merged tree (the given trees are not modified)
+        """
+        if override is None:
+            return base
+        if isinstance(base, dict) and isinstance(override, dict):
+            merged = dict(base)
+            for key, val in override.items():
+                merged[key] = YAMLSchema.merge(base.get(key), val)
+            return merged
+        if isinstance(base, list) and isinstance(override, list):
+            return base + [v for v in override if v not in base]
+        return override
+
+    @staticmethod
+    def build(tree: Any) -> Any:
+        """
+        Build the YAML objects of a parsed document, from its root keys
+
+        Args:
+            tree (Any): the parsed document
+
+        Raises:
+            RuntimeError: if a section doesn't match its class
+
+        Returns:
+            Any: the document, with the registered root keys built
+        """
+        if not isinstance(tree, dict):
+            return tree
+        out = {}
+        for key, val in tree.items():
+            key = YAMLSchema._section_key(YAMLSchema.ROOTS, key)
+            out[key] = (
+                YAMLSchema.build_object(YAMLSchema.ROOTS[key], val, key)
+                if key in YAMLSchema.ROOTS.keys()
+                else val
+            )
+        return out
+
+    @staticmethod
+    def build_object(cls: type, value: Any, path: str) -> Any:
+        """
+        Build an object of the given class from a parsed mapping, building its
+        nested YAML objects first
+
+        Args:
+            cls (type): the YAML object class
+            value (Any): the parsed mapping (None for the default object)
+            path (str): the path of the mapping in the document, for the errors
+
+        Raises:
+            RuntimeError: if the mapping doesn't match the class
+
+        Returns:
+            Any: the built object
+        """
+        if isinstance(value, cls):
+            return value  # Explicitly tagged in the document
+        if value is None:
+            value = {}
+        if not isinstance(value, dict):
+            raise RuntimeError(f"`{path}` should be a mapping, not `{value}`")
+
+        schema = YAMLSchema.schema(cls)
+        kwargs = {}
+        for key, val in value.items():
+            key = YAMLSchema._section_key(schema, key)
+            sub_cls = schema.get(key)
+            kwargs[key] = (
+                val
+                if sub_cls is None
+                else YAMLSchema.build_object(sub_cls, val, f"{path}.{key}")
+            )
+        try:
+            return cls(**kwargs)
+        except TypeError as e:
+            raise RuntimeError(f"Invalid `{path}` section: {e}")
+
+    # =========================================================================
+    # Helpers function
+    # =========================================================================
+    @staticmethod
+    def _section_key(sections: Dict[str, type], key: Any) -> Any:
+        """
+        Get the registered name of a section key, matched case-insensitively
+        (the key is returned as is if it isn't a section)
+        """
+        if not isinstance(key, str) or key in sections:
+            return key
+        for name in sections.keys():
+            if name.lower() == key.lower():
+                return name
+        return key
@@ -1,4 +1,7 @@
+from contextlib import contextmanager
+from typing import Iterator
 import os
+import stat
 
 
 def read_file(f: str) -> str | None:
@@ -28,3 +31,106 @@ def mk_file_dir(f: str) -> str:
     if not os.path.exists(d):
         os.mkdir(d)
     return d
+
+
+def is_private_dir(d: str) -> bool:
+    """
+    Check that the given directory can only be used by the current user: owned
+    by them, not a symbolic link, and without any group or other permission.
+    Always True on the systems without user ids.
+
+    Args:
+        d (str): the directory path
+
+    Returns:
+        bool: True if the directory exists and is private
+    """
+    if not hasattr(os, "getuid"):
+        return os.path.isdir(d)
+    try:
+        st = os.lstat(d)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(st.st_mode)
+        and st.st_uid == os.getuid()
+        and stat.S_IMODE(st.st_mode) == 0o700
+    )
+
+
+def make_private_dir(d: str) -> bool:
+    """
+    Create the given directory, only accessible by the current user, and check
+    that it is private (an existing directory is not changed)
+
+    Args:
+        d (str): the directory path (its missing parents are created as well)
+
+    Returns:
+        bool: True if the directory is private
+    """
+    try:
+        os.makedirs(os.path.dirname(d), mode=0o700, exist_ok=True)
+        os.mkdir(d, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    return is_private_dir(d)
+
+
+def write_if_changed(f: str, content: str) -> bool:
+    """
+    Replace the content of the given file through a temporary file renamed over
+    it, so that the file is never read half written. The file is left untouched
+    (content and modification time) if it already holds the given content.
+
+    Args:
+        f (str): the file path
+        content (str): the new content of the file
+
+    Returns:
+        bool: True if the file has been written
+    """
+    data = content.encode()
+    try:
+        with open(f, "rb") as current:
+            if current.read() == data:
+                return False
+    except OSError:
+        pass
+
+    tmp_path = f"{f}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, f)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+@contextmanager
+def file_lock(f: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the given file (created if needed) in the
+    context, waiting for the other processes holding it to release it. Nothing
+    is locked on the systems without fcntl.
+
+    Args:
+        f (str): the lock file path
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(f, "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,239 @@
+from typing import Dict, Set, Tuple
+import os
+import select
+import struct
+import time
+
+# Watched directories, as {directory: names of interest in it}, the names
+# being None when every change of the directory is of interest
+WatchSet = Dict[str, Set[str] | None]
+
+# inotify flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class INotifyWatcher:
+    """
+    Watch of a set of directories with inotify (called through ctypes, as the
+    standard library has no binding for it)
+    """
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        # Raises AttributeError on the systems without inotify
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._paths: Dict[str, int] = {}
+        self._watches: Dict[int, Tuple[str, Set[str] | None]] = {}
+
+    @property
+    def name(self) -> str:
+        return "inotify"
+
+    def update(self, watched: WatchSet) -> None:
+        """
+        Replace the watched directories. The directories that don't exist
+        anymore are skipped, their removal being reported by their parent.
+        """
+        for path, wd in list(self._paths.items()):
+            if path not in watched:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[path]
+                self._watches.pop(wd, None)
+
+        for path, names in watched.items():
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                continue
+            previous = self._paths.get(path)
+            if previous is not None and previous != wd:
+                self._watches.pop(previous, None)
+            self._paths[path] = wd
+            self._watches[wd] = (path, names)
+
+    def wait(self, timeout: float | None) -> bool:
+        """
+        Wait for a change in the watched directories
+
+        Args:
+            timeout (float | None): the maximum waiting time in seconds (None
+                to wait forever)
+
+        Returns:
+            bool: True if a change happened, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if len(ready) != 0 and self._read_events():
+                return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def _read_events(self) -> bool:
+        """
+        Consume the pending events
+
+        Returns:
+            bool: True if one of them is of interest
+        """
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return False
+
+        relevant = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            start = offset + EVENT_HEADER.size
+            name = os.fsdecode(data[start : start + length].rstrip(b"\0"))
+            offset = start + length
+
+            if mask & IN_Q_OVERFLOW:
+                relevant = True
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            path, names = watch
+            if mask & IN_IGNORED:
+                # The directory was removed (or unwatched)
+                del self._watches[wd]
+                if self._paths.get(path) == wd:
+                    del self._paths[path]
+                relevant = True
+            elif (
+                names is None or name in names or mask & (IN_DELETE_SELF | IN_MOVE_SELF)
+            ):
+                relevant = True
+        return relevant
+
+
+class PollingWatcher:
+    """
+    Watch of a set of directories by polling the modification times of their
+    entries, for the systems without inotify
+    """
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._watched: WatchSet = {}
+        self._signature: Dict[str, object] = {}
+
+    @property
+    def name(self) -> str:
+        return f"polling every {self._interval:g}s"
+
+    def update(self, watched: WatchSet) -> None:
+        self._watched = dict(watched)
+        self._signature = self._scan()
+
+    def wait(self, timeout: float | None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(
+                self._interval if remaining is None else min(self._interval, remaining)
+            )
+            signature = self._scan()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+
+    def close(self) -> None:
+        pass
+
+    def _scan(self) -> Dict[str, object]:
+        signature: Dict[str, object] = {}
+        for path, names in self._watched.items():
+            if names is not None:
+                signature[path] = [
+                    PollingWatcher._mtime(os.path.join(path, n)) for n in sorted(names)
+                ]
+                continue
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(
+                        (e.name, e.stat(follow_symlinks=False).st_mtime_ns) for e in it
+                    )
+            except OSError:
+                entries = None
+            signature[path] = (PollingWatcher._mtime(path), entries)
+        return signature
+
+    @staticmethod
+    def _mtime(path: str) -> int | None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+
+def make_watcher(
+    poll_interval: float, poll: bool = False
+) -> "INotifyWatcher | PollingWatcher":
+    """
+    Make a directories watcher, with inotify when it is available
+
+    Args:
+        poll_interval (float): the polling period of the fallback watcher, in seconds
+        poll (bool): poll the directories even if inotify is available
+
+    Returns:
+        INotifyWatcher | PollingWatcher: the watcher
+    """
+    if not poll:
+        try:
+            return INotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(poll_interval)
@@ -0,0 +1,90 @@
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+import os
+import queue
+import threading
+import time
+
+# Maximum number of threads running the tasks, shared by the whole process
+MAX_THREADS = 8
+
+_DONE = threading.Condition()
+_QUEUE: "queue.SimpleQueue[Tuple[Hashable, Callable[[], Any]]]" = queue.SimpleQueue()
+_N_THREADS = 0
+# Tasks submitted and not finished yet, by key
+_PENDING: Set[Hashable] = set()
+# Results of the finished tasks not collected yet, by key
+_RESULTS: Dict[Hashable, Any] = {}
+
+
+def run_concurrently(
+    tasks: Dict[Hashable, Callable[[], Any]], timeout: float
+) -> Dict[Hashable, Any]:
+    """
+    Run the given tasks concurrently on a pool of at most MAX_THREADS threads
+    shared by the process, and wait at most `timeout` seconds for them. The
+    threads are daemonic: a task that is still running (e.g. blocked on a hung
+    network mount) is left behind without holding the exit of the process, and
+    a task whose key is still running from a previous call is not submitted
+    again (its result is collected when it finishes).
+
+    Args:
+        tasks (Dict[Hashable, Callable[[], Any]]): the tasks, by key
+        timeout (float): the time given to the tasks, in seconds
+
+    Returns:
+        Dict[Hashable, Any]: the results of the tasks that finished in time, by
+            key (the exception raised by a task being its result)
+    """
+    global _N_THREADS
+
+    deadline = time.monotonic() + timeout
+    with _DONE:
+        for key, task in tasks.items():
+            if key in _PENDING:
+                continue
+            _RESULTS.pop(key, None)
+            _PENDING.add(key)
+            _QUEUE.put((key, task))
+            if _N_THREADS < min(MAX_THREADS, len(_PENDING)):
+                threading.Thread(target=_worker, daemon=True).start()
+                _N_THREADS += 1
+
+        while any(key not in _RESULTS for key in tasks.keys()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _DONE.wait(remaining)
+        return {key: _RESULTS[key] for key in tasks.keys() if key in _RESULTS}
+
+
+# =============================================================================
+# Helpers function
+# =============================================================================
+def _reset() -> None:
+    """
+    Forget the threads of the parent process in a forked child (e.g. the
+    workers of `gen all`), as they don't exist in it
+    """
+    global _DONE, _QUEUE, _N_THREADS
+    _DONE = threading.Condition()
+    _QUEUE = queue.SimpleQueue()
+    _N_THREADS = 0
+    _PENDING.clear()
+    _RESULTS.clear()
+
+
+def _worker() -> None:
+    while True:
+        key, task = _QUEUE.get()
+        try:
+            result = task()
+        except Exception as e:
+            result = e
+        with _DONE:
+            _PENDING.discard(key)
+            _RESULTS[key] = result
+            _DONE.notify_all()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset)
@@ -0,0 +1,156 @@
+from typing import Dict, List, Tuple
+import os
+import time
+
+TIMINGS_FLAG = "--timings"
+CPROFILE_FLAG = "--cprofile"
+
+
+class _Phase:
+    """
+    Context manager recording the wall time of a phase
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_Phase":
+        Timings._STACK.append(self.name)
+        Timings._RECORDS.setdefault(tuple(Timings._STACK), (0, 0.0))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        duration = time.perf_counter() - self.start
+        path = tuple(Timings._STACK)
+        Timings._STACK.pop()
+        count, total = Timings._RECORDS.get(path, (0, 0.0))
+        Timings._RECORDS[path] = (count + 1, total + duration)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, type, value, traceback) -> None:
+        return None
+
+
+_NO_PHASE = _NoPhase()
+
+
+class Timings:
+    """
+    Wall time instrumentation of the phases of a command, enabled with the
+    `--timings` flag or the RSWCH_TRACE environment variable. The phases are
+    nested, and their times aggregated by nesting path. A cProfile dump of the
+    whole command can also be written with `--cprofile <file>` or the
+    RSWCH_TRACE_PROFILE environment variable.
+    """
+
+    _ENABLED = False
+    _STACK: List[str] = []
+    _RECORDS: Dict[Tuple[str, ...], Tuple[int, float]] = {}
+    _PROFILER = None
+    _PROFILE_FILE: str | None = None
+
+    @staticmethod
+    def setup(argv: List[str]) -> List[str]:
+        """
+        Enable the instrumentation if asked by the command line or by the
+        environment
+
+        Args:
+            argv (List[str]): the command line arguments (without the program name)
+
+        Returns:
+            List[str]: the command line arguments without the instrumentation ones
+        """
+        # Imported here, as the common package imports this module
+        from ..common.constants import ENV_CALLER_DIR, ENV_TRACE, ENV_TRACE_PROFILE
+
+        argv = list(argv)
+        trace = os.getenv(ENV_TRACE, "")
+        Timings._ENABLED = len(trace) != 0 and trace != "0"
+        if TIMINGS_FLAG in argv:
+            argv.remove(TIMINGS_FLAG)
+            Timings._ENABLED = True
+
+        Timings._PROFILE_FILE = os.getenv(ENV_TRACE_PROFILE) or None
+        if CPROFILE_FLAG in argv:
+            idx = argv.index(CPROFILE_FLAG)
+            if idx + 1 < len(argv):
+                Timings._PROFILE_FILE = argv[idx + 1]
+            del argv[idx : idx + 2]
+        if Timings._PROFILE_FILE is not None:
+            # Relative to the directory the command was called from (the
+            # wrapper and the daemon run in the install directory)
+            caller_dir = os.getenv(ENV_CALLER_DIR) or os.getcwd()
+            Timings._PROFILE_FILE = os.path.join(caller_dir, Timings._PROFILE_FILE)
+        Timings._STACK = []
+        Timings._RECORDS = {}
+
+        if Timings._PROFILE_FILE is not None:
+            import cProfile
+
+            Timings._PROFILER = cProfile.Profile()
+            Timings._PROFILER.enable()
+        return argv
+
+    @staticmethod
+    def phase(name: str) -> "_Phase | _NoPhase":
+        """
+        Time a phase of the command, as `with Timings.phase("name"): ...`
+        """
+        return _Phase(name) if Timings._ENABLED else _NO_PHASE
+
+    @staticmethod
+    def report() -> None:
+        """
+        Emit the timings summary, write the cProfile dump and disable the
+        instrumentation
+        """
+        from ..common.ShellCom import Shell
+
+        if Timings._PROFILER is not None:
+            Timings._PROFILER.disable()
+            try:
+                Timings._PROFILER.dump_stats(Timings._PROFILE_FILE)
+                Shell.txt(f"cProfile statistics written to {Timings._PROFILE_FILE}")
+            except OSError as e:
+                Shell.txt(f"Unable to write the cProfile statistics: {e}")
+            Timings._PROFILER = None
+
+        if Timings._ENABLED and len(Timings._RECORDS) != 0:
+            Shell.txt(Timings.summary())
+        Timings._ENABLED = False
+        Timings._RECORDS = {}
+
+    @staticmethod
+    def summary() -> str:
+        """
+        Format the recorded phases as an indented table, with the share of
+        the total time of each phase
+        """
+        # Depth-first order, siblings sorted by first entrance
+        order = {path: i for i, path in enumerate(Timings._RECORDS.keys())}
+        paths = sorted(
+            order.keys(),
+            key=lambda p: [order[p[: i + 1]] for i in range(len(p))],
+        )
+        roots_total = sum(t for p, (_, t) in Timings._RECORDS.items() if len(p) == 1)
+        lines = ["Timings:"]
+        for path in paths:
+            count, total = Timings._RECORDS[path]
+            name = f"{'  ' * (len(path) - 1)}{path[-1]}"
+            calls = f" x{count}" if count > 1 else ""
+            share = 100 * total / roots_total if roots_total > 0 else 0
+            lines.append(
+                f"\t{(name + calls + ' ').ljust(40, '.')} {total * 1000:9.2f} ms {share:5.1f}%"
+            )
+        return "\n".join(lines)
@@ -27,7 +27,12 @@ fi
 # Get the script directory
 # DIR="$(get_script_dir $0)/bin"
 DIR="$(get_script_dir $sc_source)/bin"
-export PATH="$PATH:$DIR"
+
+# Functions called by the generated scripts
+source "$DIR/.rosswitch_runtime.sh"
+
+# Sourcing this file again (e.g. in a sub-shell) doesn't grow the PATH
+_rswch_path_add PATH "$DIR"
 
 alias rosswitch="source $DIR/.rosswitch"
 alias rswitch=rosswitch